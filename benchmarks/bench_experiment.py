@@ -0,0 +1,122 @@
+"""
+Benchmarks of the main Experiment paths, run by run.py. Each class
+follows the asv conventions: params/param_names, setup(*params) called
+before each timing and the timed time_* methods. The first parameter is
+the number of events.
+"""
+import os
+import tempfile
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import expy
+from expy import Experiment
+from expy.event import flatten_function, flatten_functions
+
+from generate import dataset
+
+SCALES = [100, 10000, 100000]
+
+# experiments with data and peaks, shared by the benchmarks reading them
+_loaded = {}
+
+def loaded(n):
+    """Experiment of the fityk dataset of n events with data, peaks and pressures."""
+    if(n not in _loaded):
+        folder = dataset("fityk", n)
+        ex = Experiment(name = "bench")
+        ex.load_data(folder, extension = ".dat", flag = "pressure")
+        ex.load_peaks(folder)
+        ex.load_pressure(os.path.join(folder, "Pressures"))
+        _loaded[n] = ex
+    return _loaded[n]
+
+
+class LoadData:
+    params = [SCALES, ["fityk", "casaxps"]]
+    param_names = ["events", "header"]
+
+    def setup(self, n, header):
+        self.folder = dataset(header, n)
+        self.extension = ".dat" if header == "fityk" else ".txt"
+
+    def time_load_data(self, n, header):
+        Experiment(name = "bench").load_data(self.folder, extension = self.extension, header = header, flag = "pressure")
+
+
+class LoadPeaks:
+    params = [SCALES]
+    param_names = ["events"]
+
+    def setup(self, n):
+        self.folder = dataset("fityk", n)
+        self.ex = Experiment(name = "bench")
+        self.ex.load_data(self.folder, extension = ".dat", flag = "pressure", lazy = True)
+
+    def time_load_peaks(self, n):
+        self.ex.load_peaks(self.folder)
+
+
+class LoadPressure:
+    params = [SCALES]
+    param_names = ["events"]
+
+    def setup(self, n):
+        self.ex = loaded(n)
+        self.filename = os.path.join(dataset("fityk", n), "Pressures")
+
+    def time_load_pressure(self, n):
+        self.ex.load_pressure(self.filename, force_reload = True)
+
+
+class TidyFunctions:
+    params = [SCALES]
+    param_names = ["events"]
+
+    def setup(self, n):
+        self.ex = loaded(n)
+
+    def time_tidy_functions(self, n):
+        self.ex.tidy_functions(inplace = False)
+
+    def time_flatten_function(self, n):
+        for ev in self.ex.values():
+            flatten_function(ev.function)
+
+    def time_flatten_functions(self, n):
+        flatten_functions(self.ex.values())
+
+
+class SaveRead:
+    params = [SCALES, ["json", "npz"]]
+    param_names = ["events", "format"]
+
+    def setup(self, n, format):
+        self.ex = loaded(n)
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "bench." + format)
+        self.ex.save(self.filename, format = format)
+
+    def teardown(self, n, format):
+        self.folder.cleanup()
+
+    def time_save(self, n, format):
+        self.ex.save(self.filename, format = format)
+
+    def time_read(self, n, format):
+        expy.read(self.filename)
+
+
+class PlotStack:
+    params = [SCALES, [True, False]]
+    param_names = ["events", "fast"]
+
+    def setup(self, n, fast):
+        self.ex = loaded(n)
+
+    def time_plot_stack(self, n, fast):
+        fig, ax = plt.subplots()
+        expy.plot_stack(self.ex, ax = ax, fast = fast)
+        fig.canvas.draw()
+        plt.close(fig)
@@ -0,0 +1,48 @@
+"""
+Cold (parsing) and warm (cache.FileCache) load of a folder of .dat and
+.peaks files with Experiment.load_data and Experiment.load_peaks.
+Without a folder the test data are copied n times in a temporary folder.
+
+    python benchmarks/file_cache.py [folder] [n]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from expy import Experiment
+from expy.cache import FileCache
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "data")
+
+
+def copy_data(folder, n):
+    """Copy the .dat and .peaks files of the test data n times in folder."""
+    files = [f for f in os.listdir(DATA) if f.endswith((".dat", ".peaks"))]
+    for i in range(n):
+        for f in files:
+            shutil.copy(os.path.join(DATA, f), os.path.join(folder, f"{i}_{f}"))
+
+def load(folder, cache):
+    start = time.perf_counter()
+    ex = Experiment(name = "benchmark")
+    ex.load_data(folder, extension = ".dat", cache = cache)
+    ex.load_peaks(folder, cache = cache)
+    return len(ex), time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        if(len(sys.argv) > 1):
+            folder = sys.argv[1]
+        else:
+            folder = os.path.join(tmp, "data")
+            os.mkdir(folder)
+            copy_data(folder, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+        cache = FileCache(os.path.join(tmp, "cache"), max_size = None)
+        events, no_cache = load(folder, False)
+        _, cold = load(folder, cache)
+        _, warm = load(folder, cache)
+        print(f"{events} events, cache size {cache.size()/2**20:.1f} MiB")
+        print(f"no cache {no_cache:.2f} s, cold cache {cold:.2f} s, warm cache {warm:.2f} s")
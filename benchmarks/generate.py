@@ -0,0 +1,104 @@
+"""
+Synthetic data for the benchmark suite (see run.py): fityk .dat/.peaks
+files, casaxps files and a pressure file of n events. The folders are
+written once in $EXPY_BENCH_DATA (default: <tmp>/expy-bench) and reused.
+
+    python benchmarks/generate.py kind events [points]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from expy.models import evaluate
+
+DATA_ROOT = os.environ.get("EXPY_BENCH_DATA", os.path.join(tempfile.gettempdir(), "expy-bench"))
+
+
+def event_names(n, samples = 3):
+    """Names Spot{s}_G_P{i} of n events: one pressure point for each event."""
+    return [f"Spot{i % samples + 1}_G_P{i:06d}" for i in range(n)]
+
+def _peaks(rng, peaks):
+    """Function table of peaks LorentzianA with random parameters."""
+    area = rng.uniform(1e3, 1e5, peaks)
+    center = np.sort(rng.uniform(1350, 1650, peaks))
+    hwhm = rng.uniform(3, 15, peaks)
+    return pd.DataFrame({"fname":["LorentzianA"] * peaks, "a0":area, "a1":center, "a2":hwhm})
+
+def _write_peaks(filename, function, rng):
+    lines = ["# PeakType\tCenter\tHeight\tArea\tFWHM\tparameters..."]
+    for k, (a0, a1, a2) in enumerate(function[["a0", "a1", "a2"]].to_numpy()):
+        errors = rng.uniform(0.001, 0.01, 3) * np.abs([a0, a1, a2])
+        parameters = " ".join(f"{v:g} +/- {e:g}" for v, e in zip((a0, a1, a2), errors))
+        lines.append(f"%_{k + 1}  LorentzianA\t{a1:g}\t{a0 / (np.pi * a2):g}\t{a0:g}\t{2 * a2:g}\t {parameters}")
+    with open(filename, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def write_fityk(folder, n, points = 200, peaks = 2, seed = 0):
+    """Write n fityk data files (x y f0.. ftot) and their peaks files in folder."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(1300, 1700, points)
+    for name in event_names(n):
+        function = _peaks(rng, peaks)
+        curves = evaluate(function, x)
+        y = curves["ftot"].to_numpy() + rng.normal(0, 10, points)
+        values = np.column_stack([x, y, curves.iloc[:, 1:].to_numpy()])
+        np.savetxt(os.path.join(folder, name + ".dat"), values, fmt = "%g", delimiter = " ")
+        _write_peaks(os.path.join(folder, name + ".peaks"), function, rng)
+
+def write_casaxps(folder, n, points = 200, seed = 0):
+    """Write n casaxps ASCII files (survey spectra without components) in folder."""
+    rng = np.random.default_rng(seed)
+    kinetic = np.linspace(686.6, 1486.6, points)
+    binding = 1486.6 - kinetic
+    header = ("Cycle 0:bench.spe:bench:Sur1 1\n"
+        "\tCharacteristic Energy eV\t1.486600e+003\tAcquisition Time s\t1.300000e-001\n"
+        "Name\t\t\nPosition\t\t\nFWHM\t\t\nArea\t\t\nLineshape\t\t\n"
+        "K.E.\tCounts\t\tB.E.\tCPS\n")
+    for name in event_names(n):
+        counts = rng.poisson(900, points).astype(float)
+        rows = "".join(f"{k:e}\t{c:e}\t\t{b:e}\t{c / 0.13:e}\n" for k, c, b in zip(kinetic, counts, binding))
+        with open(os.path.join(folder, name + ".txt"), "w") as f:
+            f.write(header + rows)
+
+def write_pressures(filename, n, seed = 0):
+    """Write the pressure file (File P P_STD) of the n events."""
+    rng = np.random.default_rng(seed)
+    pid = [name.split("_")[-1] for name in event_names(n)]
+    pd.DataFrame({"File":pid, "P":np.sort(rng.uniform(0, 20, n)), "P_STD":rng.uniform(0, 0.1, n)}).to_csv(filename, sep = "\t", index = False)
+
+def dataset(kind, n, points = 200):
+    """
+    Folder with the files of n events, written on the first call.
+
+    Input
+    -----------------------------------------------------------------
+    kind: str
+        "fityk" (.dat, .peaks and the pressure file Pressures) or
+        "casaxps" (.txt)
+    n: int
+        number of events
+    points: int, default 200
+        points of each spectrum
+    """
+    folder = os.path.join(DATA_ROOT, f"{kind}_{n}_{points}")
+    if(os.path.exists(os.path.join(folder, ".complete"))):
+        return folder
+    shutil.rmtree(folder, ignore_errors = True)
+    os.makedirs(folder)
+    if(kind == "fityk"):
+        write_fityk(folder, n, points)
+        write_pressures(os.path.join(folder, "Pressures"), n)
+    elif(kind == "casaxps"):
+        write_casaxps(folder, n, points)
+    else:
+        raise ValueError(f"Unknown kind {kind}: use fityk or casaxps.")
+    open(os.path.join(folder, ".complete"), "w").close()
+    return folder
+
+
+if __name__ == '__main__':
+    print(dataset(sys.argv[1], int(sys.argv[2]), *map(int, sys.argv[3:4])))
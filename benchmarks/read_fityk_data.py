@@ -0,0 +1,38 @@
+"""
+Files per second read by the fityk data parser compared with the 
+previous pandas.read_table(sep=" ") reader.
+
+    python benchmarks/read_fityk_data.py [folder] [repeat]
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+from expy.event import read_fityk_data, fityk_columns
+from expy.support import folder_to_files
+
+
+def read_table(filename):
+    """Reader used before read_fityk_data."""
+    df = pd.read_table(filename,header=None,sep=" ")
+    df.columns = fityk_columns(df.columns.size)
+    return df
+
+def files_per_second(reader, files, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        for f in files:
+            reader(f)
+    return repeat * len(files) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "tests", "data")
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    files = folder_to_files(folder, ".dat")
+    print(f"{len(files)} files in {folder}")
+    before = files_per_second(read_table, files, repeat)
+    after = files_per_second(read_fityk_data, files, repeat)
+    print(f"pandas.read_table: {before:10.1f} files/s")
+    print(f"read_fityk_data:   {after:10.1f} files/s ({after / before:.1f}x)")
@@ -0,0 +1,55 @@
+"""
+Fits per second of Experiment.refit on a synthetic pressure series 
+(three Lorentzian peaks moving with P on a linear background). All the
+events start from the same function table, as when a model is copied
+to a whole series in fityk.
+
+    python benchmarks/refit.py [events] [workers]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from expy import Experiment, Event
+from expy.models import evaluate
+
+
+def series(n, points = 1000, seed = 0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(1200, 1800, points)
+    guess = pd.DataFrame({"fid":["%_1", "%_2", "%_3", "%_4"], "fname":["LorentzianA", "LorentzianA", "LorentzianA", "Linear"],
+        "Center":np.nan, "Height":np.nan, "Area":np.nan, "FWHM":np.nan,
+        "a0":[5e4, 3e4, 2e4, 50.], "err_a0":1., "a1":[1350., 1580., 1610., 0.01], "err_a1":1., "a2":[8., 6., 10., np.nan], "err_a2":[1., 1., 1., np.nan]})
+    ex = Experiment(name = "series")
+    for i in range(n):
+        pressure = 10 * i / n
+        true = guess.copy()
+        true["a1"] += [3 * pressure, 5 * pressure, 6 * pressure, 0]
+        true["a0"] *= 1 + 0.02 * pressure
+        y = evaluate(true, x)["ftot"].to_numpy() + rng.normal(0, 5, points)
+        ev = Event(name = f"S_P{i:05d}", data = pd.DataFrame({"x":x, "y":y}), function = guess.copy())
+        ev.attributes["P"] = pressure
+        ex[ev.name] = ev
+    return ex
+
+def run(ex, **kwargs):
+    start = time.perf_counter()
+    report = ex.refit(order = "P", inplace = False, **kwargs)[1]
+    elapsed = time.perf_counter() - start
+    return len(report) / elapsed, report.nfev.mean(), report.success.mean()
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    ex = series(n)
+    cases = [
+        ("finite differences, cold start", dict(warm_start = False, jac = "2-point")),
+        ("vectorized jacobian, cold start", dict(warm_start = False)),
+        ("vectorized jacobian, warm start", dict(warm_start = True)),
+        (f"vectorized jacobian, warm start, {workers} processes", dict(warm_start = True, workers = workers)),
+        ]
+    for label, kwargs in cases:
+        rate, nfev, success = run(ex, **kwargs)
+        print(f"{label:<50} {rate:8.1f} fits/s   {nfev:6.1f} evaluations/fit   {success:.0%} converged")
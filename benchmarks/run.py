@@ -0,0 +1,102 @@
+"""
+Run the benchmark suite (bench_*.py in this folder) and compare it with
+a stored baseline. Each benchmark is timed repeat times, setup being
+called before each timing. The synthetic data are written by generate.py.
+
+    python benchmarks/run.py [-s 100 10000] [-k load] [-r 3]
+                             [--save results.json] [--compare baseline.json]
+                             [--threshold 1.2]
+
+With --compare the exit status is 1 if a benchmark is slower than the
+baseline by more than threshold (ratio of the best times).
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import platform
+import importlib
+import itertools
+import statistics
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+def discover(pattern = None):
+    """Yield (name, class, method, params) of the benchmarks matching pattern."""
+    sys.path.insert(0, FOLDER)
+    for filename in sorted(os.listdir(FOLDER)):
+        if(not (filename.startswith("bench_") and filename.endswith(".py"))):
+            continue
+        module = importlib.import_module(filename[:-3])
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if(cls.__module__ != module.__name__):
+                continue
+            params = getattr(cls, "params", [[]])
+            for method in sorted(m for m in dir(cls) if m.startswith("time_")):
+                for values in itertools.product(*params):
+                    name = f"{module.__name__}.{cls_name}.{method}({', '.join(map(repr, values))})"
+                    if(pattern is None or pattern in name):
+                        yield name, cls, method, values
+
+def measure(cls, method, values, repeat):
+    """Times in seconds of repeat calls of cls().method(*values)."""
+    times = []
+    for _ in range(repeat):
+        benchmark = cls()
+        if(hasattr(benchmark, "setup")):
+            benchmark.setup(*values)
+        start = time.perf_counter()
+        getattr(benchmark, method)(*values)
+        times.append(time.perf_counter() - start)
+        if(hasattr(benchmark, "teardown")):
+            benchmark.teardown(*values)
+    return times
+
+def compare(results, baseline, threshold):
+    """Print the ratio to the baseline of each result. Return the names of the regressions."""
+    regressions = []
+    for name, result in results.items():
+        if(name not in baseline):
+            continue
+        ratio = result["min"] / baseline[name]["min"]
+        status = ""
+        if(ratio > threshold):
+            status = "REGRESSION"
+            regressions.append(name)
+        elif(ratio < 1 / threshold):
+            status = "improved"
+        print(f"{ratio:7.2f}x  {status:<10}  {name}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "expy benchmark suite")
+    parser.add_argument("-s", "--scales", type = int, nargs = "+", default = [100], help = "numbers of events (default 100)")
+    parser.add_argument("-k", "--pattern", default = None, help = "run the benchmarks whose name contains pattern")
+    parser.add_argument("-r", "--repeat", type = int, default = 3)
+    parser.add_argument("--save", default = None, help = "json file of the results")
+    parser.add_argument("--compare", default = None, help = "json file of the baseline results")
+    parser.add_argument("--threshold", type = float, default = 1.2)
+    args = parser.parse_args()
+
+    results = {}
+    for name, cls, method, values in discover(args.pattern):
+        if(values and values[0] not in args.scales):
+            continue
+        times = measure(cls, method, values, args.repeat)
+        results[name] = {"min":min(times), "median":statistics.median(times), "repeat":len(times)}
+        print(f"{min(times):10.4f} s  {name}", flush = True)
+
+    if(args.save):
+        with open(args.save, "w") as f:
+            json.dump({"machine":platform.node(), "python":platform.python_version(), "results":results}, f, indent = "\t")
+
+    if(args.compare):
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        if(compare(results, baseline, args.threshold)):
+            sys.exit(1)
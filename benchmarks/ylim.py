@@ -0,0 +1,42 @@
+"""
+Cost per spectrum of a ylim condition evaluated with eval on every call
+compared with the condition compiled once by compile_ylim.
+
+    python benchmarks/ylim.py [spectra] [points]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from expy.plotter import compile_ylim
+
+YLIM = "df.y > 2*df.loc[(df.x > 200) & (df.x < 800)].ftot.max()"
+
+
+def per_spectrum(condition, frames):
+    start = time.perf_counter()
+    for df in frames:
+        condition(df)
+    return (time.perf_counter() - start) / len(frames)
+
+
+if __name__ == '__main__':
+    spectra = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 1000, points)
+    frames = [pd.DataFrame({"x":x, "y":rng.random(points), "ftot":rng.random(points)}) for i in range(spectra)]
+
+    before = per_spectrum(lambda df: eval(YLIM), frames)
+    after = per_spectrum(compile_ylim(YLIM), frames)
+    # parsing and checking the string
+    start = time.perf_counter()
+    for i in range(spectra):
+        compile_ylim.__wrapped__(YLIM)
+    parse = (time.perf_counter() - start) / spectra
+
+    print(f"{spectra} spectra of {points} points: {YLIM}")
+    print(f"eval:         {before*1e6:10.1f} us/spectrum")
+    print(f"compile_ylim: {after*1e6:10.1f} us/spectrum")
+    print(f"parse + check:{parse*1e6:10.1f} us (once per stack)")
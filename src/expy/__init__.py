@@ -1,4 +1,4 @@
 from expy.experiment import Experiment
-from expy.event import Event
+from expy.event import Event, Tokenizer
 from expy.io import *
 from expy.plotter import plot_stack, plot_event
@@ -0,0 +1,150 @@
+import os
+import pickle
+import hashlib
+import tempfile
+
+
+def _default_directory():
+    """User cache folder: $XDG_CACHE_HOME/expy or ~/.cache/expy."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "expy")
+
+
+def _digest(text, length):
+    return hashlib.sha1(text.encode()).hexdigest()[:length]
+
+
+class FileCache:
+    """
+    On-disk cache of the tables parsed from source files (see
+    Experiment.load_data and Experiment.load_peaks). Each entry is the
+    pickled result of parsing one file with some options and is valid
+    while the path, modification time and size of the file are the same.
+    When the entries take more than max_size bytes the oldest ones are
+    removed until they take less than shrink_to*max_size.
+    The entries are read with pickle: do not use a folder written by
+    someone else.
+    """
+    def __init__(self, directory = None, max_size = 2**30, shrink_to = .9):
+        """
+        Input
+        -----------------------------------------------------------------
+        directory: str or None, default None
+            folder of the entries, created on the first write. None uses
+            $XDG_CACHE_HOME/expy (~/.cache/expy)
+        max_size: int or None, default 1 GiB
+            maximum size of the entries in bytes. None means no limit
+        shrink_to: float, default 0.9
+            fraction of max_size left when entries are removed. The 
+            folder is scanned again only once the entries have grown 
+            back over max_size
+        """
+        self.directory = directory if directory is not None else _default_directory()
+        self.max_size = max_size
+        self.shrink_to = shrink_to
+        self._size = None       # bytes used by the entries, read on the first write
+
+    def _path(self, filename, kind, options):
+        # all the entries of a file share the prefix (see invalidate)
+        prefix = _digest(os.path.abspath(filename), 24)
+        return os.path.join(self.directory, f"{prefix}_{_digest(kind + repr(options), 12)}.pkl")
+
+    @staticmethod
+    def _signature(filename):
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, filename, kind, options = ()):
+        """
+        Return the value stored for filename parsed as kind with options
+        or None if there is none or the file was modified.
+        """
+        try:
+            with open(self._path(filename, kind, options), "rb") as f:
+                signature, value = pickle.load(f)
+            if(signature == self._signature(filename)):
+                return value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        return None
+
+    def put(self, filename, kind, value, options = ()):
+        """Store value, the result of parsing filename as kind with options."""
+        try:
+            signature = self._signature(filename)
+        except OSError:
+            return
+        os.makedirs(self.directory, exist_ok = True)
+        path = self._path(filename, kind, options)
+        # written to a temporary file first: readers never see half an entry
+        fd, temporary = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((signature, value), f, protocol = pickle.HIGHEST_PROTOCOL)
+        old = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temporary, path)
+        if(self._size is not None):
+            self._size += os.path.getsize(path) - old
+        self._shrink()
+
+    def _entries(self):
+        """(modification time, size, path) of the entries."""
+        if(not os.path.isdir(self.directory)):
+            return []
+        entries = []
+        for entry in os.scandir(self.directory):
+            if(entry.name.endswith(".pkl")):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """Bytes used by the entries."""
+        self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def _shrink(self):
+        if(self.max_size is None):
+            return
+        if(self._size is None):
+            self.size()
+        if(self._size <= self.max_size):
+            return
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if(self._size <= self.max_size*self.shrink_to):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+    def invalidate(self, filename):
+        """Remove the entries of filename."""
+        prefix = _digest(os.path.abspath(filename), 24) + "_"
+        for _, size, path in self._entries():
+            if(os.path.basename(path).startswith(prefix)):
+                os.remove(path)
+                if(self._size is not None):
+                    self._size -= size
+
+    def clear(self):
+        """Remove all the entries."""
+        for _, _, path in self._entries():
+            os.remove(path)
+        self._size = 0
+
+
+# used by load_data and load_peaks with cache=True
+file_cache = FileCache()
+
+def _get_cache(cache):
+    """FileCache to use for the cache argument of the loaders or None."""
+    if(cache is True):
+        return file_cache
+    if(cache is False or cache is None):
+        return None
+    if(isinstance(cache, str)):
+        return FileCache(cache)
+    return cache
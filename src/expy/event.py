@@ -3,6 +3,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import json
 import re
+import sys
+from itertools import count
+from functools import partial
 
 import scimate.mathtools as mt
 
@@ -10,12 +13,97 @@ import scimate.mathtools as mt
 from .support import strip_path, accept_event_flags
 from .plotter import plot_event
 from .event_operations import *
+from .lazy import data_cache, EditedSource
+from .profiling import instrument, argument_size
+
+class Tokenizer:
+    """
+    Split event names in tokens (see tokenize). The patterns are compiled 
+    once and the tokens of each name are computed once: events with a 
+    name already seen share the same token values. 
+    A schema renames and converts the tokens, e.g. 
+    Tokenizer(schema = {"T1":"sample", "T3":("spot", int)}).
+    """
+    def __init__(self, char = "_", schema = None, pid_pattern = r"P\d", maxsize = 2**17):
+        """
+        Input
+        -----------------------------------------------------------------
+        char: str, default "_"
+            character used to split the names
+        schema: dict or None, default None
+            {token: name} or {token: (name, type)} with token T1, T2, ... 
+            The tokens that can not be converted to type are kept as str
+        pid_pattern: str, default "P\\d"
+            regular expression matching the start of the Pid token
+        maxsize: int, default 2**17
+            number of names kept. The cache is emptied when it is full
+        """
+        self.char = char
+        self.schema = dict(schema) if schema else {}
+        self._pid = re.compile(pid_pattern)
+        self.maxsize = maxsize
+        self._cache = {}
+
+    def _tokens(self, string, pid):
+        # tokens repeat across events (sample names, Pid...). Interned strings are stored once
+        d = {f"T{i + 1}":sys.intern(t) for i,t in enumerate(string.split(self.char))}
+        if pid:
+            # Check for Pid
+            for key,val in d.items():
+                if(self._pid.match(val)):
+                    d.pop(key)
+                    d["Pid"] = val
+                    break
+        for key, field in self.schema.items():
+            if(key not in d):
+                continue
+            name, kind = field if isinstance(field, tuple) else (field, None)
+            val = d.pop(key)
+            if(kind is not None):
+                try:
+                    val = kind(val)
+                except (TypeError, ValueError):
+                    pass
+            d[name] = val
+        return d
+
+    def __call__(self, string, pid = False):
+        """
+        Return a new dictionary of the tokens of string. See tokenize for 
+        pid.
+        """
+        key = (string, pid)
+        d = self._cache.get(key)
+        if d is None:
+            if len(self._cache) >= self.maxsize:
+                self._cache.clear()
+            d = self._cache[key] = self._tokens(string, pid)
+        return d.copy()
+
+    def clear(self):
+        """Empty the cache."""
+        self._cache.clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        return state
+
+# tokenizers of tokenize, by character
+_tokenizers = {}
+
+def _tokenizer(char):
+    """Tokenizer shared by the calls of tokenize with char."""
+    tokenizer = _tokenizers.get(char)
+    if tokenizer is None:
+        tokenizer = _tokenizers[char] = Tokenizer(char)
+    return tokenizer
 
 def tokenize(string, char = "_", pid = False):
     """
     Split the file name in individual tokens that can have important information.
     Using the flag pid a special tocken is given by a tocken starting with P and 
-    followed by a number 
+    followed by a number. See Tokenizer.
     
     Input
     -----------------------------------------------
@@ -33,39 +121,518 @@ def tokenize(string, char = "_", pid = False):
         Dictionary of the tokens
 
     """
-    s = string.split(char)
-    d = {f"T{i + 1}":t for i,t in enumerate(s)}
-    if pid:
-        # Check for Pid
-        for key,val in d.items():
-            if(re.match(r"P\d",val)):
-                d.pop(key)
-                d["Pid"] = val
-                break
-    return d
+    return _tokenizer(char)(string, pid)
+
+def _flat_arrays(tables):
+    """
+    Flatten function tables into long arrays. Used by flatten_function 
+    and flatten_functions.
 
+    Input
+    -----------------------------------------------------------------
+    tables: list of DataFrame
+        function tables, each with a "fname" column
+
+    Return
+    -----------------------------------------------------------------
+    tuple:
+        (table, name, param, position, value) arrays with one element for 
+        each non missing parameter. name is the function name with _n 
+        appended to the n-th duplicate, position is the index of the 
+        element in the flatten table it belongs to
+    """
+    # tables sharing the same columns are stacked in one block
+    groups = {}
+    for i,t in enumerate(tables):
+        groups.setdefault(tuple(t.columns), []).append(i)
+
+    parts = []
+    for columns, members in groups.items():
+        block = np.concatenate([tables[i].to_numpy(dtype = object) for i in members])
+        lengths = [len(tables[i]) for i in members]
+        params = [j for j,c in enumerate(columns) if c not in ("fid","fname","Lineshape")]
+
+        #rename duplicates to avoid conlicts adding _n if more then one occurence where n is the occurrence index 
+        names = []
+        rows = []
+        start = 0
+        for length in lengths:
+            seen = {}
+            for name in block[start:start + length, columns.index("fname")]:
+                n = seen.get(name, 0)
+                seen[name] = n + 1
+                names.append(name if n == 0 else f"{name}_{n}")
+            rows.append(np.arange(length))
+            start += length
+
+        values = pd.DataFrame(block[:, params]).infer_objects().to_numpy()
+        n_params = len(params)
+        parts.append((
+            np.repeat(np.repeat(members, lengths), n_params),
+            np.repeat(np.asarray(names, dtype = object), n_params),
+            np.tile(np.asarray(columns, dtype = object)[params], len(block)),
+            (np.concatenate(rows)[:,None] * n_params + np.arange(n_params)).ravel() if len(block) else np.array([], dtype = np.int64),
+            values.ravel()
+        ))
+
+    table, name, param, position, value = (np.concatenate(x) for x in zip(*parts))
+    keep = pd.notna(value)
+    return table[keep], name[keep], param[keep], position[keep], value[keep]
+
+@instrument(rows = len)
 def flatten_function(data):
     """Create a flatten version of a function DataFrame."""
-    df = data.copy()
-    names = df.pop("fname") 
-    #rename duplicates to avoid conlicts adding _n if more then one occurence where n is the occurrence index 
-    names = names + "_" + pd.DataFrame(names).groupby("fname").cumcount().astype(str).replace("0","")
-    names = names.str.removesuffix("_")
+    _, names, params, _, values = _flat_arrays([data])
+    name_codes, name_levels = pd.factorize(names)
+    param_codes, param_levels = pd.factorize(params)
+    index = pd.MultiIndex(levels = [name_levels, param_levels], codes = [name_codes, param_codes], verify_integrity = False)
+    return pd.Series(values, index = index)
+
+def _flat_head(event, extra):
+    """List of (key, value) pairs that get_function_flat adds before the functions."""
+    if(extra is None):
+        return []
+    if(extra == "all"):
+        return [("name", event.name)] + list(event.attributes.items())
+    if(extra == "minimal"):
+        return [(key, value) for key, value in event.attributes.items() if key in ("P","Pid")]
+    if(isinstance(extra,str)):
+        extra = [extra]
+    return [(key, value) for key, value in event.attributes.items() if key in extra]
+
+@instrument(rows = lambda result: len(result[0]) if isinstance(result, tuple) else len(result))
+def flatten_functions(events, extra = "all", layouts = False):
+    """
+    Build the table of flatten functions of many events in one pass. 
+    Equivalent to a DataFrame of Event.get_function_flat(extra) for each 
+    event, with the same (fname_n, param) columns in the same order.
 
-    df.drop(columns = ["fid","Lineshape"], errors = "ignore", inplace = True)
-    indexes = pd.MultiIndex.from_product([names, df.columns])
+    Input
+    -----------------------------------------------------------------
+    events: iterable of Event
+        events to put in the table, one row each
+    extra: None, str or list, default "all"
+        see Event.get_function_table
+    layouts: bool, default False
+        also return the columns of each event
+
+    Return
+    -----------------------------------------------------------------
+    pandas.DataFrame or tuple:
+        the table or, if layouts is True, (table, layouts) with layouts 
+        the tuple of the columns of the row of each event in their order.
+        The columns of the table are the union of the layouts in order
+    """
+    events = list(events)
+    n = len(events)
+
+    # extra values: few per event, collected in python
+    head_keys = {}
+    head_event, head_code, head_pos, head_value = [], [], [], []
+    for i,ev in enumerate(events):
+        for j,(key,value) in enumerate(_flat_head(ev, extra)):
+            head_event.append(i)
+            head_code.append(head_keys.setdefault((key, ""), len(head_keys)))
+            head_pos.append(j)
+            head_value.append(value)
+    head_event = np.asarray(head_event, dtype = np.int64)
+    head_code = np.asarray(head_code, dtype = np.int64)
+    head_pos = np.asarray(head_pos, dtype = np.int64)
+    head = np.full((n, len(head_keys)), np.nan, dtype = object)
+    head[head_event, head_code] = np.asarray(head_value + [None], dtype = object)[:-1]
+    head = pd.DataFrame(head, columns = pd.MultiIndex.from_tuples(list(head_keys)) if head_keys else None).infer_objects()
+
+    # functions: all the tables are flattened at once 
+    with_function = [i for i,ev in enumerate(events) if ev.function is not None and len(ev.function) > 0]
+    if(with_function):
+        table, names, params, func_pos, values = _flat_arrays([events[i].function for i in with_function])
+        func_event = np.asarray(with_function, dtype = np.int64)[table]
+        name_code, name_keys = pd.factorize(names)
+        param_code, param_keys = pd.factorize(params)
+        func_code, func_keys = pd.factorize(name_code * len(param_keys) + param_code)
+        func_keys = pd.MultiIndex.from_arrays([name_keys[func_keys // len(param_keys)], param_keys[func_keys % len(param_keys)]])
+
+        func = np.full((n, len(func_keys)), np.nan, dtype = values.dtype if values.dtype.kind == "f" else object)
+        func[func_event, func_code] = values
+        func = pd.DataFrame(func, columns = func_keys).infer_objects()
+    else:
+        func_event = func_code = func_pos = np.array([], dtype = np.int64)
+        func = pd.DataFrame(index = range(n))
+
+    # columns sorted by first appearance as for a DataFrame of Series 
+    codes = np.concatenate([head_code, func_code + len(head_keys)])
+    pos = np.concatenate([head_pos, np.bincount(head_event, minlength = n)[func_event] + func_pos])
+    order = np.concatenate([head_event, func_event]) * (int(pos.max(initial = 0)) + 1) + pos
+    first = np.full(head.columns.size + func.columns.size, np.iinfo(np.int64).max)
+    np.minimum.at(first, codes, order)
+
+    parts = [part for part in (head, func) if part.columns.size > 0]
+    if(not parts):
+        df = pd.DataFrame(index = range(n))
+        return (df, [()] * n) if layouts else df
+    df = pd.concat(parts, axis = 1)
+    permutation = np.argsort(first, kind = "stable")
+    df = df.iloc[:, permutation]
+    if(not layouts):
+        return df
 
-    s = pd.concat([i[1] for i in df.iterrows()])
-    s.index = indexes
-    s.dropna(inplace = True)
+    # columns of each event: codes sorted by event and position, split by event
+    position = np.empty_like(permutation)
+    position[permutation] = np.arange(permutation.size)
+    events_of = np.concatenate([head_event, func_event])
+    columns = position[codes[np.lexsort((pos, events_of))]]
+    stops = np.cumsum(np.bincount(events_of, minlength = n))
+    pool = {}
+    keys = df.columns
+    event_layouts = []
+    for start, stop in zip(stops - np.bincount(events_of, minlength = n), stops):
+        signature = columns[start:stop].tobytes()
+        if(signature not in pool):
+            pool[signature] = tuple(keys[columns[start:stop]])
+        event_layouts.append(pool[signature])
+    return df, event_layouts
+
+def _table_head(event, extra):
+    """List of (column, value) pairs that get_function_table adds before the functions."""
+    if(extra is None):
+        return []
+    if(extra == "all"):
+        cols = list(event.attributes.items()) + [("name",event.name)]
+    elif(extra == "minimal"):
+        cols = [("errP" , event.attributes.get("errP")) if "errP" in event.attributes else None,("P" , event.attributes.get("P")),("name",event.name)]
+    else:
+        if(isinstance(extra,str)):
+            extra = [extra]
+        cols = [(label,event.attributes[label]) if label in event.attributes else None for label in extra] + [("name",event.name)]
+    # get_function_table inserts each column in first position
+    return [x for x in reversed(cols) if x is not None]
+
+@instrument()
+def function_tables(events, extra = "all", index = None, layouts = False):
+    """
+    Build the table of functions of many events in one pass. Equivalent 
+    to concatenating Event.get_function_table(extra) for each event.
 
-    return s 
+    Input
+    -----------------------------------------------------------------
+    events: iterable of Event
+        events to put in the table
+    extra: None, str or list, default "all"
+        see Event.get_function_table
+    index: list or None, default None
+        one label for each event used as index of its rows. None gives
+        a RangeIndex
+    layouts: bool, default False
+        also return the columns of each event
+
+    Return
+    -----------------------------------------------------------------
+    pandas.DataFrame or tuple:
+        the table or, if layouts is True, (table, layouts) with layouts 
+        the tuple of the columns of the table of each event (None for 
+        the events without functions). The columns of the table are the
+        union of the layouts in order
+    """
+    events = list(events)
+    with_function = [i for i,ev in enumerate(events) if ev.function is not None]
+    event_layouts = [None] * len(events)
+    if(not with_function):
+        return (pd.DataFrame(), event_layouts) if layouts else pd.DataFrame()
+    tables = [events[i].function for i in with_function]
+    lengths = [len(t) for t in tables]
+    heads = [dict(_table_head(events[i], extra)) for i in with_function]
+
+    # columns in order of first appearance as pd.concat does
+    pool = {}
+    for i, head, t in zip(with_function, heads, tables):
+        layout = (*head, *t.columns)
+        event_layouts[i] = pool.setdefault(layout, layout)
+    columns = list(dict.fromkeys(c for layout in pool for c in layout))
+    head_columns = list(dict.fromkeys(c for head in heads for c in head))
+
+    table = pd.concat(tables, ignore_index = True)
+    head = pd.DataFrame({c:np.repeat(np.asarray([h.get(c, np.nan) for h in heads] + [None], dtype = object)[:-1], lengths) for c in head_columns}, index = table.index)
+    df = pd.concat([head.infer_objects(), table], axis = 1)[columns]
+    if(index is not None):
+        df.index = np.repeat(np.asarray([index[i] for i in with_function] + [None], dtype = object)[:-1], lengths)
+    return (df, event_layouts) if layouts else df
+
+def function_column_names(names):
+    """
+    Names of the data columns of the functions named names (fname): the
+    repeated names get a counter, e.g. G, G_01, G_02. See 
+    Event.rename_data_columns.
+    """
+    dic = {}
+    columns = []
+    for val in names:
+        if(not isinstance(dic.get(val),type(None))):
+            dic[val] += 1
+            val += f'_{dic[val]:02d}'
+        else:
+            dic[val] = 0
+        columns.append(val)
+    return columns
+
+# predefined header formats of read_data. Only the errors of custom 
+# headers (pandas.read_table) are caught by Event.get_data
+_header_formats = ("fityk", "casaxps")
+
+@instrument(nbytes = argument_size(), rows = lambda result: len(result[0]))
+def read_data(filename, header = "fityk", **kwargs):
+    """
+    Read a file containing data in columns. Used by Event.get_data, it 
+    does not depend on an Event so it can run in a separate process.
+
+    Input
+    -----------------------------------------------------------------
+    filename: str
+        Input file
+    header: 
+        Build header in predefined formats or as pandas.read_table
+        Accepted predefined:
+            - "fityk" 
+            - "casaxps" 
+    kwargs:
+        keyword arguments passed to pandas.read_table
+
+    Return
+    -----------------------------------------------------------------
+    tuple:
+        (data, function, attributes). function and attributes are None 
+        unless the file format provides them
+    """
+    def check_kwargs(header):
+        if(len(kwargs)>0):
+            print(f"WARNING! keyword arguments passed for custom header: {header}. Ignoring arguments.")
+    #read the data file. Except the case in which the header tipe is wrong. "fityk" also falls in this case 
+    if(header == "fityk"):
+        check_kwargs(header)            
+        return read_fityk_data(filename), None, None
+    elif(header == "casaxps"):
+        check_kwargs(header)            
+        return read_casaxps(filename)
+    else:
+        return pd.read_table(filename, header=header, **kwargs), None, None
+
+# column names of the fityk data files by number of columns. Shared by
+# all the files with the same number of functions
+_fityk_columns = {}
+
+def fityk_columns(n):
+    """Return the columns x, y, f0..fn, ftot of a fityk data file with n columns."""
+    if(n not in _fityk_columns):
+        _fityk_columns[n] = pd.Index(["x","y"] + [f"f{i}" for i in range(n - 3)] + ["ftot"])
+    return _fityk_columns[n]
+
+@instrument(nbytes = argument_size(), rows = len)
+def read_fityk_data(filename):
+    """
+    Read a data file exported by fityk (x, y, one column per function and 
+    the total, separated by spaces). The numbers are parsed in one pass 
+    into a float array used without copy by the DataFrame. Files that 
+    can not be parsed this way are read with pandas.read_table.
+
+    Input
+    -----------------------------------------------------------------
+    filename: str or file object
+        Input file
+
+    Return
+    -----------------------------------------------------------------
+    DataFrame:
+        columns x, y, f0..fn, ftot
+    """
+    try:
+        values = np.loadtxt(filename, delimiter = " ", ndmin = 2)
+    except ValueError:
+        # ragged rows or non numeric values
+        if(hasattr(filename, "seek")):
+            filename.seek(0)
+        df = pd.read_table(filename,header=None,sep=" ")
+        df.columns = fityk_columns(df.columns.size)
+        return df
+    return pd.DataFrame(values, columns = fityk_columns(values.shape[1]), copy = False)
+
+def _parameter_columns(n, errors):
+    """Names of the n parameter columns of a fityk peaks table."""
+    if(errors):
+        return [f"a{int(i/2)}" if (not i%2) else f"err_a{int(i/2)}" for i in range(n)]
+    else:
+        return [f"a{i}" for i in range(n)]
+
+def _parse_parameters(parameters):
+    """
+    Parse the "parameters..." column of fityk peaks tables. All the rows 
+    are joined and parsed in one pass.
+
+    Return
+    -----------------------------------------------------------------
+    tuple:
+        (values, counts, unknown). values is a 2D array with one row per 
+        function padded with NaN, counts is the number of parameters of 
+        each row and unknown is True where values has a "?" (the error 
+        of the parameters fixed in fityk)
+    """
+    #replace ? by 0 for unknown errors. Missing parameters are empty rows
+    text = "\n".join(parameters.fillna("")).replace("+/-","   ")
+    #count the numbers in each row from the position of the first character of each number
+    chars = np.frombuffer(text.encode(), dtype = np.uint8)
+    text = text.replace("?","0")
+    space = np.isin(chars, np.frombuffer(b" \t\n\r", dtype = np.uint8))
+    starts = np.flatnonzero(~space & np.r_[True, space[:-1]])
+    rows = np.cumsum(chars == ord("\n"))[starts]
+    counts = np.bincount(rows, minlength = parameters.size)
+    values = np.fromstring(text, sep = " ") if text.strip() else np.empty(0)
+    if(values.size != starts.size):
+        #not a number somewhere. float raises the error
+        values = np.array(text.split(), dtype = float)
+
+    matrix = np.full((counts.size, counts.max(initial = 0)), np.nan)
+    unknown = np.zeros(matrix.shape, dtype = bool)
+    offsets = np.cumsum(counts) - counts
+    positions = (np.repeat(np.arange(counts.size), counts), np.arange(values.size) - np.repeat(offsets, counts))
+    matrix[positions] = values
+    unknown[positions] = chars[starts] == ord("?")
+    return matrix, counts, unknown
+
+def _split_peak_type(peak_type):
+    """Split the "# PeakType" column of fityk peaks tables in function id and name."""
+    tokens = "\n".join(peak_type).split()
+    if(len(tokens) == 2 * peak_type.size):
+        return tokens[0::2], tokens[1::2]
+    #names with spaces
+    split = peak_type.str.split(n = 2, expand = True)
+    return split[0].tolist(), split[1].tolist()
+
+@instrument(nbytes = argument_size(name = "files"), rows = lambda result: sum(len(t) for t in result))
+def read_peaks(files, errors = True):
+    """
+    Read fityk peaks files (see Event.read_fityk). The parameters of all
+    the files are parsed at once.
+
+    Input
+    -----------------------------------------------------------------
+    files: list
+        peaks files (names or file objects)
+    errors: bool, default = True
+        if False the errors are named as parameters (a0, a1, ...)
+
+    Return
+    -----------------------------------------------------------------
+    list:
+        one DataFrame per file with columns fid, fname, Center, Height, 
+        Area, FWHM and the parameters a*/err_a*. With errors, the 
+        parameters fixed in fityk (error "?", read as 0) are kept in 
+        attrs["fixed"] as {fid: positions of the parameters} (see 
+        Experiment.refit)
+    """
+    #x is used for the quantities that do not have clearly defined one of the standard parameters (Center,Height...). They will be replaced by NaN
+    tables = [pd.read_table(f,na_values = "x") for f in files]
+    if(not tables):
+        return []
+    sizes = np.array([len(t) for t in tables])
+    #the name and parameters columns of all the files are parsed together
+    #split function name and id 
+    fid, fname = _split_peak_type(pd.concat([t["# PeakType"] for t in tables], ignore_index = True))
+    #split the parameters that are placed all together by Fityk
+    values, counts, unknown = _parse_parameters(pd.concat([t["parameters..."] for t in tables], ignore_index = True))
+
+    functions = []
+    for table, start, stop in zip(tables, np.cumsum(sizes) - sizes, np.cumsum(sizes)):
+        function = table.drop(columns = ["# PeakType","parameters..."])
+        function.insert(0,"fid",fid[start:stop])
+        function.insert(1,"fname",fname[start:stop])
+        n = counts[start:stop].max(initial = 0)
+        pars = pd.DataFrame(values[start:stop,:n], columns = _parameter_columns(n, errors), index = function.index)
+        function = function.join(pars)
+        if(errors):
+            #errors are the odd columns
+            fixed = {f:tuple(np.flatnonzero(row).tolist()) for f,row in zip(function["fid"], unknown[start:stop,1:n:2]) if row.any()}
+            if(fixed):
+                function.attrs["fixed"] = fixed
+        functions.append(function)
+    return functions
+
+class DataFileSource:
+    """
+    Data of an event read from a data file when needed. Used by 
+    Experiment.load_data with lazy=True. See read_data for the inputs.
+    """
+    def __init__(self, filename, header = "fityk", kwargs = None):
+        self.filename = filename
+        self.header = header
+        self.kwargs = kwargs if kwargs is not None else {}
+
+    def load(self):
+        """Return the data table."""
+        return read_data(self.filename, header = self.header, **self.kwargs)[0]
+
+def _add_background(data, pattern, col_name):
+    """Add to data the sum of the columns matching pattern. See Event.background."""
+    #select all the columns matching ant pattern and sum by rows    
+    truth_table = [[bool(re.match(j,i)) for i in data.columns] for j in pattern]
+    data[col_name] = data.loc[:,np.any(truth_table,axis = 0)].sum(axis = 1)
+
+# every change of an Event takes a new stamp. Experiment compares the 
+# stamps to find the events to update in its tables
+_stamps = count()
+
+class Attributes(dict):
+    """
+    Dictionary of the Event attributes. Any change marks the owning Event
+    as modified (see Event.touch).
+    """
+    def __init__(self, event, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._event = event
+
+    def _touch(self):
+        # while unpickling items are set before _event
+        event = self.__dict__.get("_event")
+        if event is not None:
+            event.touch()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._touch()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._touch()
+        return item
+
+    def setdefault(self, key, default = None):
+        if key not in self:
+            self._touch()
+        return super().setdefault(key, default)
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
 
 class Event:
     """
     Event class gathering in a dictionary the data and fit results
     """
-    def __init__(self, data = None, name = None, attributes = None, function = None, tokenby = "_", flag = None, header = "fityk", **kwargs):
+    def __init__(self, data = None, name = None, attributes = None, function = None, tokenby = "_", flag = None, header = "fityk", tokenizer = None, **kwargs):
         """
         Input
         -----------------------------------------------------------------
@@ -82,6 +649,8 @@ class Event:
               stored in the json experiment file 
         header: str, default = fityk
             can specify the header format to pass to load_data
+        tokenizer: Tokenizer or None, default None
+            tokenizer of the name. None uses tokenize with tokenby
         **kwargs:
             keyword arguments for custom reading of data. 
             See pandas.read_table for accepted values.
@@ -91,17 +660,19 @@ class Event:
         pid = "pressure" in flag
         json_file = "read_json_file" in flag
 
+        if tokenizer is None:
+            tokenizer = _tokenizer(tokenby)
         self.name = name if name is not None else None
         self.attributes = attributes if attributes is not None else None
         if (self.name is not None) and (self.attributes is None):
-            self.attributes = tokenize(self.name, tokenby, pid)
+            self.attributes = tokenizer(self.name, pid = pid)
 
         # handle data reading
         if(isinstance(data,str)):
             if self.name is None:
                 self.name = strip_path(data)
             if self.attributes is None:
-                self.attributes = tokenize(self.name, tokenby, pid)
+                self.attributes = tokenizer(self.name, pid = pid)
             self.get_data(data, header=header, **kwargs)
         else:
             if(isinstance(data, dict)):
@@ -127,14 +698,125 @@ class Event:
                 except:
                     pass
                 self.function = function
-            elif("function" not in dir(self)): # if it is None and not already existing
+            elif("_function" not in self.__dict__): # if it is None and not already existing
                     self.function = function
-                    
-        # create self.function_flat
-        if self.function is not None:
-            self.function_flat = flatten_function(self.function)
+
+
+    # -----------------------------------------------------------------
+    # Tracked state
+    # -----------------------------------------------------------------
+    @property
+    def function(self):
+        """Functions table. Setting it also resets self.function_flat"""
+        return self._function
+
+    @function.setter
+    def function(self, function):
+        self._function = function
+        self._function_flat = None
+        self.touch()
+
+    @property
+    def function_flat(self):
+        """Flatten version of self.function (see flatten_function). Computed on first access"""
+        if self._function_flat is None and self._function is not None:
+            self._function_flat = flatten_function(self._function)
+        return self._function_flat
+
+    @function_flat.setter
+    def function_flat(self, function_flat):
+        self._function_flat = function_flat
+
+    @property
+    def data(self):
+        """
+        Data table. For lazy events (see set_data_source) it is loaded on 
+        access and released when too many tables are in memory (see 
+        lazy.set_cache_size)
+        """
+        source = self.__dict__.get("_data_source")
+        if source is None:
+            # None if the data file could not be parsed
+            return self.__dict__.get("_data")
+        data = self._data
+        if data is None:
+            data = self._data = source.load()
+        data_cache.touch(self)
+        return data
+
+    @data.setter
+    def data(self, data):
+        if self.__dict__.get("_data_source") is not None:
+            data_cache.discard(self)
+        self._data_source = None
+        self._data = data
+
+    def set_data_source(self, source):
+        """
+        Make self.data lazy. source.load() is called when self.data is 
+        accessed and must return the data table.
+        """
+        data_cache.discard(self)
+        self._data = None
+        self._data_source = source
+
+    def release_data(self):
+        """Free the memory used by the data of a lazy event. No effect otherwise."""
+        if self.__dict__.get("_data_source") is not None:
+            self._data = None
+            data_cache.discard(self)
+
+    @property
+    def is_lazy(self):
+        """True if self.data is read from a source when needed"""
+        return self.__dict__.get("_data_source") is not None
+
+    def _edit_data(self, edit):
+        """
+        Apply edit (function editing a DataFrame in place) to self.data. 
+        For lazy events the edit is repeated every time the data is loaded.
+        """
+        if self.is_lazy:
+            self._data_source = EditedSource(self._data_source, edit)
+            if self._data is not None:
+                edit(self._data)
         else:
-            self.function_flat = None
+            edit(self.data)
+
+    @property
+    def attributes(self):
+        """Dictionary of attributes (tokens of the name, P, ...)"""
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes):
+        self._attributes = Attributes(self, attributes) if attributes is not None else None
+        self.touch()
+
+    def touch(self):
+        """
+        Mark the event as modified. Called when self.function or 
+        self.attributes change. Call it after editing self.function in place 
+        so that the Experiment tables are updated.
+        """
+        self._stamp = next(_stamps)
+
+    @property
+    def stamp(self):
+        """Number changing every time the event is modified"""
+        return self._stamp
+
+    def __setstate__(self, state):
+        # events pickled before data, function(_flat) and attributes were properties
+        for key in ("data", "function", "function_flat", "attributes"):
+            if key in state:
+                state["_" + key] = state.pop(key)
+        attributes = state.get("_attributes")
+        if attributes is not None and not isinstance(attributes, Attributes):
+            state["_attributes"] = Attributes(self, attributes)
+        self.__dict__.update(state)
+        # stamps are only unique within a session
+        self.touch()
 
 
     # -----------------------------------------------------------------
@@ -194,13 +876,10 @@ class Event:
         if(isinstance(pattern,str)):
             pattern = [pattern]
 
-        #select all the columns matching ant pattern and sum by rows    
-        truth_table = [[bool(re.match(j,i)) for i in self.data.columns] for j in pattern]
-        new_col = self.data.loc[:,np.any(truth_table,axis = 0)].sum(axis = 1)
-
         #adds new column
-        self.data[col_name] = new_col
+        self._edit_data(partial(_add_background, pattern = pattern, col_name = col_name))
 
+    @instrument()
     def rename_data_columns(self):
         """
         Rename standard column fityk names to the functions names in self.function
@@ -210,16 +889,9 @@ class Event:
             return
 
 
-        names = self.function.get("fname")
-        dic = {}
-        for i,val in enumerate(names):
-            if(not isinstance(dic.get(val),type(None))):
-                dic[val] += 1
-                val += f'_{dic[val]:02d}'
-            else:
-                dic[val] = 0
-
-            self.data.rename(columns= {f"f{i}":val},inplace = True)
+        names = function_column_names(self.function.get("fname"))
+        columns = {f"f{i}":val for i,val in enumerate(names)}
+        self._edit_data(partial(pd.DataFrame.rename, columns = columns, inplace = True))
 
 
     # -----------------------------------------------------------------
@@ -326,28 +998,37 @@ class Event:
             keyword arguments passed to pandas.read_table
 
         """
-        def check_kwargs(header):
-            if(len(kwargs)>0):
-                print(f"WARNING! keyword arguments passed for custom header: {header}. Ignoring arguments.")
-        #read the data file. Except the case in which the header tipe is wrong. "fityk" also falls in this case 
-        if(header == "fityk"):
-            check_kwargs(header)            
-            df = pd.read_table(filename,header=None,sep=" ")
-            df.columns = ["x","y"] + [f"f{i}" for i in range(df.columns.size - 3)] + ["ftot"]
-        elif(header == "casaxps"):
-            check_kwargs(header)            
-            df, funcs, attributes = read_casaxps(filename)
-            self.function = funcs
+        try:
+            parsed = read_data(filename, header=header, **kwargs)
+        except ValueError as er:
+            if(header in _header_formats):
+                raise
+            # print("Wrong header format. None is considered.")
+            print(er)
+            return
+        self.set_data(*parsed)
+
+    def set_data(self, data, function = None, attributes = None):
+        """
+        Assign the output of read_data to the event.
+
+        Input
+        -----------------------------------------------------------------
+        data: DataFrame
+            data table
+        function: DataFrame or None, default None
+            functions found in the data file. None leaves self.function 
+            unchanged
+        attributes: dict or None, default None
+            attributes found in the data file. They are added to 
+            self.attributes
+        """
+        if function is not None:
+            self.function = function
+        if attributes:
             for key, val in attributes.items():
                 self.attributes[key] = val
-        else:
-            try:
-                df = pd.read_table(filename, header=header, **kwargs)
-            except ValueError as er:
-                    # print("Wrong header format. None is considered.")
-                    print(er)
-                    return
-        self.data = df
+        self.data = data
 
     def read_fityk(self,filename, errors = True):
         """
@@ -366,31 +1047,8 @@ class Event:
 
 
         """
-        #x is used for the quantities that do not have clearly defined one of the standard parameters (Center,Height...). They will be replaced by NaN
-        df = pd.read_table(filename,na_values = "x")
-
-        #split function name and id 
-        # df.insert(0,"name",self.name)
-        df.insert(1,"fid",[x.split()[0] for x in df.loc[:,"# PeakType"]])
-        df.insert(2,"fname",[x.split()[1] for x in df.loc[:,"# PeakType"]])
-
-        #split the parameters that are placed all together by Fityk and replace ? by 0 for unknown errors 
-        pars = pd.DataFrame([map(float,x.replace("+/-","").replace("?","0").split()) if isinstance(x, str) else x for x in df.loc[:,"parameters..."]])
-        if(errors):
-            pars.columns = [f"a{int(i/2)}" if (not i%2) else f"err_a{int(i/2)}" for i in range(len(pars.columns))]
-        else:
-            pars.columns = [f"a{i}" for i in range(len(pars.columns))]
-
-        #adds the parameters 
-        df = df.join(pars)
-
-        #drop useless columns 
-        df.drop(columns = ["# PeakType",'parameters...'],inplace = True)
-
-    
-        #add the functions dataframe and calculates the 
-        self.function = df
-        self.function_flat = flatten_function(df)
+        #add the functions dataframe (function_flat is calculated when needed)
+        self.function = read_peaks([filename], errors)[0]
 
 
     def parse_pos_from_name(self,name = None, decimal = ",", sep = ":",drop_suffix = None,drop_prefix = None):
@@ -2,35 +2,228 @@ import numpy as np
 import pandas as pd
 import pickle
 import json
+import re
+import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 #local import
-from expy.event import Event
-from expy.support import strip_path,folder_to_files,accept_event_flags
+from expy.event import Event, DataFileSource, read_data, read_peaks, flatten_functions, function_tables, _header_formats
+from expy.support import strip_path,folder_to_files,accept_event_flags,parallel_map
 from expy.plotter import plot_stack
+from expy.storage import write_npz
+from expy.mapping import MapIndex
+from expy.cache import _get_cache
+from expy.models import evaluate_batch, SumModel, fit, fitted_table
+from expy.profiling import instrument, argument_size
 
 sort_key_Pid = lambda x:x[1].attributes["Pid"]
 sort_key_P = lambda x:x[1].attributes["P"]
 
+def _read_data_job(job):
+    """Worker of Experiment.load_data. job is (filename, header, kwargs)."""
+    filename, header, kwargs = job
+    return read_data(filename, header=header, **kwargs)
+
+def _read_bytes(filename):
+    """Content of filename. Used by the async loaders."""
+    with open(filename, "rb") as f:
+        return f.read()
+
+def _parse_data_job(job):
+    """
+    Worker of Experiment.aload_data. job is (content, header, kwargs) 
+    with content the bytes of the file or its name.
+    """
+    content, header, kwargs = job
+    if(isinstance(content, bytes)):
+        content = io.BytesIO(content)
+    return read_data(content, header=header, **kwargs)
+
+def _parse_peaks_job(job):
+    """Worker of Experiment.aload_peaks. job is (contents, errors)."""
+    contents, errors = job
+    return read_peaks([io.BytesIO(c) for c in contents], errors)
+
+def _refit_job(job):
+    """
+    Worker of Experiment.refit. job is (events, lineshapes, method, 
+    warm_start, fixed, kwargs) with events a list of (key, x, y, function) 
+    fitted one after the other.
+    """
+    events, lineshapes, method, warm_start, fixed, kwargs = job
+    models = {}
+    previous = None     # (fnames, parameters) of the last fit
+    results = []
+    for key, x, y, function in events:
+        try:
+            fnames = tuple(function["fname"])
+            if(fnames not in models):
+                models[fnames] = SumModel(fnames, lineshapes)
+            model = models[fnames]
+            p0, free = model.parameters(function, fixed)
+            if(warm_start and previous is not None and previous[0] == fnames):
+                p0[free] = previous[1][free]
+            parameters, errors, result = fit(model, x, y, p0, free, method, **kwargs)
+            table = fitted_table(function, model, parameters, errors, lineshapes, free)
+            results.append((key, table, (result.success, result.cost, result.nfev, result.message)))
+            previous = (fnames, parameters) if result.success else None
+        except Exception as er:
+            results.append((key, None, (False, np.nan, 0, repr(er))))
+            previous = None
+    return results
+
+def _concat_rows(old, new):
+    """Append the rows of new to old ignoring tables without columns."""
+    parts = [x for x in (old, new) if x.columns.size > 0]
+    if len(parts) < 2:
+        return parts[0] if parts else new
+    return pd.concat(parts)
+
+def _decategorize(table):
+    """Copy of table with the categorical columns converted to the dtype of their values."""
+    return table.astype({c:dtype.categories.dtype for c,dtype in table.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)})
+
+def _natural_key(string):
+    """Sort key comparing the digits of string as numbers: "P2" < "P10"."""
+    return [(0, float(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", string) if part]
+
+def _layout_columns(layouts, keys, position):
+    """
+    Union in order of the columns of the events keys: layouts[key][position]
+    (see function_tables and flatten_functions). The equal layouts are 
+    the same object and are only read once.
+    """
+    seen = set()
+    unique = []
+    for key in keys:
+        layout = layouts[key][position]
+        if(layout is not None and id(layout) not in seen):
+            seen.add(id(layout))
+            unique.append(layout)
+    return list(dict.fromkeys(c for layout in unique for c in layout))
+
+def _name_index(names, tokens = False):
+    """
+    Map each name (or each token of the names, split by "_" and spaces) 
+    to the list of positions where it is found. Used by load_pressure.
+    """
+    index = {}
+    for row, name in enumerate(names):
+        for key in (re.split(r"[_\s]+", name) if tokens else [name]):
+            rows = index.setdefault(key, [])
+            if(not rows or rows[-1] != row):
+                rows.append(row)
+    return index
+
+def _data_blocks(events):
+    """
+    Group the data of events by column layout (columns, dtypes and 
+    length). Used by the Experiment operations on data.
+
+    Return
+    -----------------------------------------------------------------
+    list:
+        (keys, frames, columns, numeric, block) for each layout. numeric
+        are the positions of the numeric columns and block the float 
+        array (events, rows, numeric columns) of their values
+    """
+    groups = {}
+    for key, ev in events:
+        data = ev.data
+        if(not isinstance(data, pd.DataFrame)):
+            continue
+        layout = (tuple(data.columns), tuple(data.dtypes), len(data))
+        groups.setdefault(layout, ([], []))
+        groups[layout][0].append(key)
+        groups[layout][1].append(data)
+
+    blocks = []
+    for (columns, dtypes, _), (keys, frames) in groups.items():
+        numeric = np.array([isinstance(d, np.dtype) and d.kind in "biuf" for d in dtypes], dtype = bool)
+        numeric = np.flatnonzero(numeric)
+        block = np.stack([df.iloc[:,numeric].to_numpy(dtype = float) if numeric.size < len(columns) else df.to_numpy(dtype = float) for df in frames])
+        blocks.append((keys, frames, frames[0].columns, numeric, block))
+    return blocks
+
+def _from_block(frames, columns, numeric, block):
+    """Rebuild the DataFrames of a layout from the edited block. See _data_blocks."""
+    if(numeric.size == len(columns)):
+        return [pd.DataFrame(values, index = df.index, columns = columns, copy = False) for df,values in zip(frames, block)]
+    tables = []
+    for df, values in zip(frames, block):
+        df = df.copy()
+        for j, position in enumerate(numeric):
+            df.isetitem(position, values[:,j])
+        tables.append(df)
+    return tables
+
+def _interpolation(x, x_grid, method):
+    """
+    Indices and weights interpolating values given on x at x_grid: 
+    values[:,left]*(1 - weight) + values[:,left + 1]*weight. Points of 
+    x_grid outside x are flagged in outside.
+
+    Return
+    -----------------------------------------------------------------
+    tuple:
+        (order, left, weight, outside). order sorts x if it is not 
+        increasing, otherwise None
+    """
+    order = None
+    if(x.size > 1 and np.any(np.diff(x) < 0)):
+        order = np.argsort(x, kind = "stable")
+        x = x[order]
+    left = np.clip(np.searchsorted(x, x_grid, side = "right") - 1, 0, max(x.size - 2, 0))
+    right = np.minimum(left + 1, x.size - 1)
+    step = x[right] - x[left]
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        weight = np.where(step > 0, (x_grid - x[left]) / step, 0.)
+    if(method == "nearest"):
+        weight = (weight > .5).astype(float)
+    elif(method != "linear"):
+        raise ValueError(f"Unknown interpolation method {method}. Accepted: linear, nearest.")
+    outside = (x_grid < x[0]) | (x_grid > x[-1])
+    return order, left, weight, outside
+
+def _positions(columns, numeric, selection, name):
+    """Positions in the block of the numeric columns selection. Raise KeyError for missing columns."""
+    positions = columns.get_indexer(selection)
+    if((positions < 0).any()):
+        raise KeyError(f"{name}: columns {list(np.asarray(selection)[positions < 0])} not found.")
+    block_positions = np.searchsorted(numeric, positions)
+    if((block_positions >= numeric.size).any() or (numeric[np.minimum(block_positions, numeric.size - 1)] != positions).any()):
+        raise TypeError(f"{name}: non numeric columns selected.")
+    return block_positions
+
 #should it be a dictionary i.e. a dictionary of events each event has a name 
 class Experiment(dict):
 
-    def __init__(self, *args, name = ""):
+    # Tokenizer of the names of the events created by the loaders. None 
+    # uses event.tokenize
+    tokenizer = None
+
+    def __init__(self, *args, name = "", tokenizer = None):
         """
         Constructor.
         Inputs
         -----------------------------------------------------------------
         name: str, default:""
             experiment's name
+        tokenizer: Tokenizer or None, default: None
+            tokenizer of the names of the events created by load_data, 
+            e.g. Tokenizer(schema = {"T1":"sample", "T3":"spot"})
         *args:
             the only accepted signature is one positional argument of 
             type dict. The dictionary must contain only Event values.
 
         """
         super().__init__({})
+        self._reset_tables()
+        if tokenizer is not None:
+            self.tokenizer = tokenizer
         if len(args) == 0:
             self.name = name
-            self.functions = None
-            self.functions_flat = None
         elif len(args) == 1:
             data = args[0]
             if isinstance(data, dict):
@@ -57,11 +250,18 @@ class Experiment(dict):
     def summary(self):
         print(f"Experiment: {self.name} \n{len(self)} events found")
 
+    @instrument()
     def tidy_functions(self, extra = "all", inplace = True, include_models=False):
         """
         Assign self.functions to a DataFrrame with all the event functions
         attached.
 
+        When inplace is True the tables are discarded and built again when 
+        self.functions or self.functions_flat are read. Later reads only 
+        update the rows of the events added, removed or modified (see 
+        Event.touch): call tidy_functions after editing a function table 
+        in place.
+
         Input 
         -----------------------------------------------------------------
         extra: None, str or list, default "all"
@@ -78,28 +278,702 @@ class Experiment(dict):
         include_models: bool, default=False
             flag to include model and model_formula if present in attributes
         """
-        functions = pd.concat([event.get_function_table(extra) for event in self.values()])
-        functions.reset_index(drop = True, inplace = True)
-        functions_flat = pd.DataFrame([event.get_function_flat(extra) for event in self.values()])
+        if not inplace:
+            functions = function_tables(self.values(), extra)
+            functions_flat = flatten_functions(self.values(), extra)
+            return self._drop_models(functions, functions_flat, include_models)
+
+        self._reset_tables()
+        self._tidy = (extra, include_models)
+
+    def _track_functions(self, extra = "all", include_models = False):
+        """
+        tidy_functions used by the loaders: the tables already built are 
+        kept and updated for the events they modified.
+        """
+        if self._tidy != (extra, include_models):
+            self.tidy_functions(extra, include_models = include_models)
+
+    @staticmethod
+    def _drop_models(functions, functions_flat, include_models):
+        """Remove model and model_formula from the function tables."""
         if not include_models:
             functions = functions.drop(columns = ["model", "model_formula"], errors="ignore")
             functions_flat = functions_flat.drop(columns = [("model",""), ("model_formula", "")], errors="ignore")
+        return functions, functions_flat
 
-        if inplace:
-            self.functions = functions
-            self.functions_flat = functions_flat
-        else:
-            return functions, functions_flat
+    def _reset_tables(self):
+        """Discard the function tables. Used by tidy_functions."""
+        self._tidy = None           # (extra, include_models) of the last tidy_functions
+        self._tidy_stamps = {}      # key: Event.stamp of the events in the tables
+        self._tidy_layouts = {}     # key: (columns of functions, columns of functions_flat) of the event
+        self._tidy_tables = None    # (functions, functions_flat) indexed by key
+        self._tidy_order = None     # keys order of self._functions
+        self._functions = None
+        self._functions_flat = None
+
+    @instrument("Experiment.update_tables")
+    def _update_tables(self):
+        """Update the function tables for the modified events only."""
+        if self._tidy is None:
+            return
+        stamps = self._tidy_stamps
+        dirty = [key for key,ev in self.items() if stamps.get(key) != ev.stamp]
+        removed = stamps.keys() - self.keys()
+        keys = list(self)
+        if not dirty and not removed and keys == self._tidy_order:
+            return
+
+        layouts = self._tidy_layouts
+        if dirty or removed or self._tidy_tables is None:
+            extra = self._tidy[0]
+            events = [self[key] for key in dirty]
+            functions, functions_layouts = function_tables(events, extra, index = dirty, layouts = True)
+            functions_flat, flat_layouts = flatten_functions(events, extra, layouts = True)
+            functions_flat = functions_flat.set_axis(dirty)
+            if self._tidy_tables is not None:
+                old, old_flat = self._tidy_tables
+                drop = list(removed.union(dirty))
+                functions = _concat_rows(old[~old.index.isin(drop)], functions)
+                functions_flat = _concat_rows(old_flat[~old_flat.index.isin(drop)], functions_flat)
+            for key in removed:
+                del stamps[key]
+                del layouts[key]
+            for key,ev,layout,flat_layout in zip(dirty, events, functions_layouts, flat_layouts):
+                stamps[key] = ev.stamp
+                layouts[key] = (layout, flat_layout)
+            self._tidy_tables = (functions, functions_flat)
+
+        # tables follow the order of the events
+        functions, functions_flat = self._tidy_tables
+        order = np.argsort(pd.Categorical(functions.index, categories = keys).codes, kind = "stable")
+        columns, flat_columns = self._table_columns(keys)
+        if removed:
+            # columns of the removed events only
+            self._tidy_tables = (functions[columns], functions_flat[flat_columns])
+        self._functions = functions.iloc[order, functions.columns.get_indexer(columns)].reset_index(drop = True)
+        self._functions_flat = functions_flat.reindex(index = keys, columns = flat_columns).reset_index(drop = True)
+        self._tidy_order = keys
+
+    def _table_columns(self, keys):
+        """
+        Columns of functions and functions_flat for the events keys in 
+        that order: the same as building the tables for these events.
+        """
+        columns = _layout_columns(self._tidy_layouts, keys, 0)
+        flat_columns = _layout_columns(self._tidy_layouts, keys, 1)
+        if not self._tidy[1]:
+            columns = [c for c in columns if c not in ("model", "model_formula")]
+            flat_columns = [c for c in flat_columns if c not in (("model",""), ("model_formula", ""))]
+        return columns, flat_columns
+
+    @property
+    def functions(self):
+        """Table of the functions of all the events. See tidy_functions."""
+        self._update_tables()
+        return self._functions
+
+    @property
+    def functions_flat(self):
+        """Table of the flatten functions, one row for each event. See tidy_functions."""
+        self._update_tables()
+        return self._functions_flat
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ("_tidy_stamps", "_tidy_layouts", "_tidy_tables", "_tidy_order", "_functions", "_functions_flat", "_map_index", "_attributes_cache"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        # experiments pickled before the tables were updated on demand
+        tidy = state.pop("_tidy", None)
+        if state.pop("functions", None) is not None:
+            tidy = ("all", False)
+        state.pop("functions_flat", None)
+        self.__dict__.update(state)
+        self._reset_tables()
+        self._tidy = tidy
+
+    @instrument()
     def get_attributes(self):
         """
-        Return a table with the attributes 
+        Return a table with the attributes, one row for each event. 
+        The table is kept and only the rows of the events added or 
+        modified since the last call are rebuilt (see Event.stamp). 
+        The returned table is a copy and can be modified.
+        """
+        return _decategorize(self._attribute_table())
+
+    def _attribute_table(self):
+        """
+        Attribute table of get_attributes, shared by the calls. It must 
+        not be modified. Columns of strings (tokens) are stored as 
+        unordered categorical.
         """
-        return pd.DataFrame([event.attributes for event in self.values()])
+        stamps, rows, order, table = self.__dict__.get("_attributes_cache") or ({}, None, None, None)
+        keys = list(self)
+        dirty = [key for key,ev in self.items() if stamps.get(key) != ev.stamp]
+        removed = stamps.keys() - self.keys()
+        if(table is not None and not dirty and not removed and order == keys):
+            return table
+
+        if(dirty or removed or rows is None):
+            new = pd.DataFrame([dict(self[key].attributes) for key in dirty], index = pd.Index(dirty, dtype = object))
+            if(rows is not None):
+                rows = _concat_rows(rows[~rows.index.isin(list(removed.union(dirty)))], new)
+            else:
+                rows = new
+            for key in removed:
+                del stamps[key]
+            for key in dirty:
+                stamps[key] = self[key].stamp
+
+        table = rows.reindex(keys).reset_index(drop = True)
+        #columns in order of first appearance as in a table built from the attribute dicts
+        present = table.notna().to_numpy()
+        if(present.shape[0] == 0):
+            first = np.full(present.shape[1], -1)
+        else:
+            first = np.where(present.any(axis = 0), present.argmax(axis = 0), -1)
+        table = table.iloc[:, [j for j in np.argsort(first, kind = "stable") if first[j] >= 0]]
+        for column in table.columns:
+            if(table[column].dtype == object or pd.api.types.is_string_dtype(table[column].dtype)):
+                try:
+                    table[column] = table[column].astype("category")
+                except TypeError:
+                    # unhashable values
+                    pass
+        rows = rows[table.columns]
+        self._attributes_cache = (stamps, rows, keys, table)
+        return table
 
     def sort(self, *args, **kargs):
         """Sort experiment using sorted. *args and **kargs are passed to sorted."""
-        return type(self)(dict(sorted(self.items(), *args, **kargs)), name = self.name)
+        result = type(self)(dict(sorted(self.items(), *args, **kargs)), name = self.name, tokenizer = self.tokenizer)
+        position = {key:i for i,key in enumerate(self)}
+        self._share_tables(result, [position[key] for key in result])
+        return result
+
+    def _sort_column(self, column):
+        """Values of an attribute, name or functions_flat column used by sort_by."""
+        if(isinstance(column, tuple)):
+            return self.functions_flat[column]
+        attributes = self._attribute_table()
+        if(column in attributes.columns):
+            return attributes[column]
+        if(column == "name"):
+            return pd.Series([ev.name for ev in self.values()], dtype = object)
+        functions_flat = self.functions_flat
+        if(functions_flat is not None):
+            for fname,parameter in functions_flat.columns:
+                if(column == f"{fname}_{parameter}"):
+                    return functions_flat[(fname,parameter)]
+        raise KeyError(f"{column} is not an attribute or a functions_flat column.")
+
+    @instrument()
+    def sort_by(self, by, ascending = True, natural = True):
+        """
+        Sort the events by attributes or fit parameters. The keys are 
+        sorted with numpy and the function and attribute tables are 
+        reordered instead of being rebuilt. Missing values go last.
+
+        Input
+        -----------------------------------------------------------------
+        by: str, tuple or list
+            attribute (e.g. "Pid", "P"), "name", functions_flat column 
+            as tuple ("G","Center") or as "G_Center". A list sorts by 
+            several columns, the first one being the primary key
+        ascending: bool or list, default True
+            sort order of each column
+        natural: bool, default True
+            sort strings by their numbers as numbers: "P2" < "P10"
+
+        Return
+        -----------------------------------------------------------------
+        Experiment
+        """
+        if(not self):
+            # no events, hence no columns to sort by
+            return self.where([])
+        if(not isinstance(by, list)):
+            by = [by]
+        if(isinstance(ascending, bool)):
+            ascending = [ascending]*len(by)
+
+        ranks = []
+        for column, ascend in zip(by, ascending):
+            values = self._sort_column(column)
+            if(pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype)):
+                rank = values.to_numpy(dtype = float)
+            else:
+                #strings are ranked once for each distinct value
+                codes, uniques = pd.factorize(values, use_na_sentinel = True)
+                key = _natural_key if natural else str
+                order = sorted(range(len(uniques)), key = lambda i: key(str(uniques[i])))
+                position = np.empty(len(uniques), dtype = float)
+                position[order] = np.arange(len(uniques))
+                rank = np.where(codes >= 0, position[codes] if len(uniques) else np.nan, np.nan)
+            if(not ascend):
+                rank = -rank
+            ranks.append(np.where(np.isnan(rank), np.inf, rank))
+
+        # lexsort uses the last key as the primary one
+        order = np.lexsort(ranks[::-1]) if ranks else np.arange(len(self))
+        keys = list(self)
+        result = type(self)({keys[i]:self[keys[i]] for i in order}, name = self.name, tokenizer = self.tokenizer)
+        self._share_tables(result, order)
+        return result
+
+    def _share_tables(self, other, order = None):
+        """
+        Give other (an Experiment with a part of the events of self) the 
+        rows of the function and attribute tables of self instead of 
+        rebuilding them. order (positions of the events of self) tells 
+        that other has all the events of self in that order: the tables 
+        are only reordered.
+        """
+        if(order is not None):
+            return self._reorder_tables(other, np.asarray(order))
+        keys = list(other)
+        if(self._tidy is not None):
+            self._update_tables()
+            functions, functions_flat = self._tidy_tables
+            other._reset_tables()
+            other._tidy = self._tidy
+            other._tidy_tables = (functions[functions.index.isin(keys)], functions_flat.loc[keys])
+            other._tidy_stamps = {key:self._tidy_stamps[key] for key in keys}
+            other._tidy_layouts = {key:self._tidy_layouts[key] for key in keys}
+        cache = self.__dict__.get("_attributes_cache")
+        if(cache is not None):
+            stamps, rows = cache[:2]
+            other._attributes_cache = ({key:stamps[key] for key in keys if key in stamps}, rows[rows.index.isin(keys)], None, None)
+
+    def _reorder_tables(self, other, order):
+        """See _share_tables."""
+        keys = list(other)
+        if(self._tidy is not None):
+            self._update_tables()
+            other._reset_tables()
+            other._tidy = self._tidy
+            # the tables indexed by key do not depend on the order
+            other._tidy_tables = self._tidy_tables
+            other._tidy_stamps = dict(self._tidy_stamps)
+            other._tidy_layouts = dict(self._tidy_layouts)
+            # rows of each event are contiguous in self._functions
+            functions = self._functions
+            position = np.empty(len(order), dtype = np.intp)
+            position[order] = np.arange(len(order))
+            events = np.sort(pd.Index(self._tidy_order).get_indexer(self._tidy_tables[0].index))
+            rows = np.argsort(position[events], kind = "stable")
+            # the order of the columns depends on the order of the events
+            columns, flat_columns = other._table_columns(keys)
+            other._functions = functions.iloc[rows, functions.columns.get_indexer(columns)].reset_index(drop = True)
+            other._functions_flat = self._functions_flat.iloc[order, self._functions_flat.columns.get_indexer(flat_columns)].reset_index(drop = True)
+            other._tidy_order = keys
+        cache = self.__dict__.get("_attributes_cache")
+        if(cache is not None and cache[3] is not None and cache[2] == list(self)):
+            stamps, rows, _, table = cache
+            other._attributes_cache = (dict(stamps), rows, keys, table.iloc[order].reset_index(drop = True))
+
+    def where(self, mask):
+        """
+        Experiment with the events selected by mask. The events are 
+        shared (not copied) and the rows of the function and attribute 
+        tables are taken from self.
+
+        Input
+        -----------------------------------------------------------------
+        mask: array-like of bool
+            one value for each event, in the order of the events (e.g. a
+            condition on self.functions_flat or self.get_attributes())
+
+        Return
+        -----------------------------------------------------------------
+        Experiment
+        """
+        mask = np.asarray(mask, dtype = bool)
+        if(mask.shape != (len(self),)):
+            raise ValueError(f"mask must have one value for each event ({len(self)}), got shape {mask.shape}.")
+        selected = type(self)({key:ev for (key,ev),m in zip(self.items(), mask) if m}, name = self.name, tokenizer = self.tokenizer)
+        self._share_tables(selected)
+        return selected
+
+    def query(self, expr, **kwargs):
+        """
+        Experiment with the events satisfying expr. See where.
+        The condition is evaluated by pandas (DataFrame.eval) on the 
+        attribute table (see get_attributes), the event names (name) and 
+        the parameters of self.functions_flat named fname_parameter. 
+        Local variables can be used with @.
+        e.g.:
+            ex.query("(T1 == 'Spot1') & (G_Center > 1580) & (P < @pmax)")
+
+        Input
+        -----------------------------------------------------------------
+        expr: str
+            boolean condition
+        kwargs:
+            keyword arguments passed to DataFrame.eval
+
+        Return
+        -----------------------------------------------------------------
+        Experiment
+        """
+        if(not self):
+            # no events, hence no columns to evaluate expr on
+            return self.where([])
+        resolvers = [{"name":pd.Series([ev.name for ev in self.values()], dtype = object)}]
+        functions_flat = self.functions_flat
+        if(functions_flat is not None):
+            names = [fname if parameter == "" else f"{fname}_{parameter}" for fname,parameter in functions_flat.columns]
+            resolvers.insert(0, functions_flat.set_axis(names, axis = 1))
+        #level locates the @ variables in the caller
+        kwargs["level"] = kwargs.get("level", 0) + 1
+        mask = self.get_attributes().eval(expr, resolvers = resolvers, **kwargs)
+        if(not pd.api.types.is_bool_dtype(mask)):
+            raise TypeError(f"The query did not return a boolean condition: {expr}")
+        return self.where(mask)
+
+    # -----------------------------------------------------------------
+    # Maps
+    # -----------------------------------------------------------------
+
+    def map_index(self, columns = ("map_x","map_y")):
+        """
+        Spatial index of the events with map coordinates in their 
+        attributes (see Event.parse_pos_from_name and mapping.MapIndex). 
+        The index is kept until an event is added, removed or modified.
+
+        Input
+        -----------------------------------------------------------------
+        columns: tuple, default ("map_x","map_y")
+            attributes used as coordinates
+        """
+        columns = tuple(columns)
+        signature = [(key, ev.stamp) for key,ev in self.items()]
+        cached = self.__dict__.get("_map_index")
+        if(cached is None or cached[0] != columns or cached[1] != signature):
+            cached = self._map_index = (columns, signature, MapIndex(self, columns))
+        return cached[2]
+
+    def rasterize(self, parameter, columns = ("map_x","map_y"), decimals = None):
+        """
+        Image of a column of self.functions_flat on the map grid. See 
+        mapping.MapIndex.rasterize.
+
+        Input
+        -----------------------------------------------------------------
+        parameter: tuple or str
+            column of self.functions_flat, e.g. ("G", "Center")
+        columns: tuple, default ("map_x","map_y")
+            attributes used as coordinates
+        decimals: int or None, default None
+            round the coordinates before building the grid
+
+        Return
+        -----------------------------------------------------------------
+        tuple:
+            (image, x, y). image has shape (len(y), len(x))
+        """
+        if(self.functions_flat is None):
+            self.tidy_functions()
+        values = pd.Series(self.functions_flat[parameter].to_numpy(), index = list(self))
+        return self.map_index(columns).rasterize(values, decimals)
+
+    # -----------------------------------------------------------------
+    # Operations on data
+    # -----------------------------------------------------------------
+
+    def _assign_data(self, tables, inplace):
+        """Return tables in the order of the events or, if inplace, assign them to the events."""
+        if(not inplace):
+            return {key:tables[key] for key in self if key in tables}
+        for key, table in tables.items():
+            self[key].data = table
+
+    @instrument()
+    def normalize(self, ref = "y", exclude = "x", inplace = False):
+        """
+        Normalize the data of all the events to their maximum value as 
+        Event.normalize. Events with the same column layout are processed
+        together as one array.
+
+        Input
+        -----------------------------------------------------------------
+        ref: None, str or list, default "y"
+            columns whose maximum is used to normalize. None uses the 
+            maximum of all the normalized columns
+        exclude : None, str or list, default "x"
+            columns left unchanged
+        inplace: bool, default False
+            if True the normalized tables replace the events data 
+            (lazy events are loaded)
+
+        Return
+        -----------------------------------------------------------------
+        dict or None:
+            normalized DataFrame of each event key. None if inplace
+        """
+        if(isinstance(exclude, str)):
+            exclude = [exclude]
+        if(isinstance(ref, str)):
+            ref = [ref]
+
+        tables = {}
+        for keys, frames, columns, numeric, block in _data_blocks(self.items()):
+            #columns to normalize and reference resolved once for each layout
+            selected = np.ones(numeric.size, dtype = bool)
+            if(exclude is not None):
+                selected = ~columns[numeric].isin(exclude)
+            reference = _positions(columns, numeric, ref, "ref") if ref is not None else np.flatnonzero(selected)
+            maximum = np.fmax.reduce(block[:,:,reference], axis = (1,2))
+            block[:,:,selected] /= maximum[:,None,None]
+            tables.update(zip(keys, _from_block(frames, columns, numeric, block)))
+        return self._assign_data(tables, inplace)
+
+    @instrument()
+    def refit(self, order = None, warm_start = True, workers = None, executor = "process", method = "lm", lineshapes = None, x = "x", y = "y", inplace = True, fixed = None, **kwargs):
+        """
+        Fit again the data of the events with their functions (see 
+        models.fit), using the function tables as initial parameters. 
+        The parameters, errors and peak properties are written in the 
+        function tables as Event.read_fityk does. Parameters without 
+        error in the peaks file (fixed in fityk) are kept fixed with 
+        their error.
+        The events are fitted in order and, with warm_start, each fit 
+        starts from the result of the previous event when they have the 
+        same functions. With workers the ordered events are split in 
+        contiguous parts fitted at the same time.
+
+        Input
+        -----------------------------------------------------------------
+        order: None, callable, str or list, default = None
+            order of the fits: None is the order of the events, a 
+            callable is a key of sort (e.g. sort_key_P), a str or a list 
+            are the columns of sort_by (e.g. "P")
+        warm_start: bool, default = True
+            start from the parameters of the previous fit
+        workers: int or None, default = None
+            number of parts fitted at the same time. See load_data
+        executor: str, default = "process"
+            "process" or "thread". See support.parallel_map
+        method: str, default = "lm"
+            see scipy.optimize.least_squares
+        lineshapes: dict or None, default = None
+            lineshapes of the user defined functions, 
+            e.g. {"Air":"LorentzianA"}. See models.components
+        x, y: str, default = "x", "y"
+            data columns fitted
+        inplace: bool, default = True
+            if True the function tables of the events are replaced
+        fixed: dict or None, default = None
+            {fid: positions of the parameters} kept fixed in all the 
+            events, e.g. {"%_1":[0, 2]} fixes a0 and a2 of %_1. None uses 
+            the parameters fixed in the peaks files, kept by load_peaks 
+            in function.attrs["fixed"] (not kept by save). Parameters 
+            with NaN error are always fixed
+        **kwargs:
+            passed to scipy.optimize.least_squares
+
+        Return
+        -----------------------------------------------------------------
+        DataFrame or tuple:
+            report of the fits (success, cost, nfev, message), one row for 
+            each event in the order of the fits. With inplace=False 
+            ({key: function table}, report)
+        """
+        if(order is None):
+            keys = list(self)
+        elif(callable(order)):
+            keys = [key for key,_ in sorted(self.items(), key = order)]
+        else:
+            keys = list(self.sort_by(order))
+
+        events = []
+        for key in keys:
+            ev = self[key]
+            if(ev.function is None or ev.data is None):
+                continue
+            values = ev.data[[x, y]].to_numpy(dtype = float)
+            values = values[np.isfinite(values).all(axis = 1)]
+            events.append((key, values[:,0], values[:,1], ev.function))
+        # unknown lineshapes are reported before fitting
+        SumModel(pd.unique(np.concatenate([function["fname"].to_numpy(dtype = object) for *_,function in events] + [np.empty(0, dtype = object)])), lineshapes)
+
+        parts = workers if(workers is not None and workers > 1) else 1
+        jobs = [([events[i] for i in part], lineshapes, method, warm_start, fixed, kwargs) for part in np.array_split(np.arange(len(events)), parts) if part.size]
+        functions = {}
+        report = {}
+        for results, error in parallel_map(_refit_job, jobs, workers, executor):
+            if(error is not None):
+                raise error
+            for key, table, fit_report in results:
+                if(table is not None):
+                    functions[key] = table
+                report[key] = fit_report
+        report = pd.DataFrame.from_dict(report, orient = "index", columns = ["success", "cost", "nfev", "message"])
+
+        if(not inplace):
+            return functions, report
+        for key, table in functions.items():
+            self[key].function = table
+        return report
+
+    @instrument()
+    def evaluate_functions(self, x = None, lineshapes = None, chunk_size = 256):
+        """
+        Compute the curves of the functions of the events from their 
+        parameters (see models.evaluate_batch), without the function 
+        columns of the data files. 
+
+        Input
+        -----------------------------------------------------------------
+        x: array or None, default = None
+            points shared by all the events. None uses the column x of 
+            the data of each event
+        lineshapes: dict or None, default = None
+            lineshapes of the user defined functions, 
+            e.g. {"Air":"LorentzianA"}. See models.components
+        chunk_size: int, default = 256
+            number of events computed together
+
+        Return
+        -----------------------------------------------------------------
+        dict:
+            {key: DataFrame with columns x, one per function, ftot} for the 
+            events with functions, in the order of the events
+        """
+        keys = [key for key,ev in self.items() if ev.function is not None]
+        if(x is None):
+            x = [self[key].data["x"].to_numpy() for key in keys]
+        curves = evaluate_batch([self[key].function for key in keys], x, lineshapes, chunk_size)
+        return dict(zip(keys, curves))
+
+    @instrument()
+    def to_matrix(self, column = "y", x_grid = None, method = "linear", x = "x", dtype = float, chunk_size = 1024):
+        """
+        Matrix of the values of column of all the events on the same x 
+        grid. Events whose x is x_grid are copied directly. The others 
+        are interpolated in batch: events sharing the same x are 
+        interpolated together with weights computed once.
+
+        Input
+        -----------------------------------------------------------------
+        column: str, default "y"
+            data column
+        x_grid: None or array, default None
+            x values of the matrix columns. None uses the x of the first 
+            event
+        method: str, default "linear"
+            interpolation method: "linear" or "nearest". Points outside 
+            the x range of an event are NaN
+        x: str, default "x"
+            x column
+        dtype: numpy dtype, default float
+            dtype of the matrix. float32 halves the memory
+        chunk_size: int, default 1024
+            number of events interpolated at once. Limits the memory used
+            by temporary arrays
+
+        Return
+        -----------------------------------------------------------------
+        tuple:
+            (matrix, names, x_grid). matrix has shape (events, points), 
+            names are the event keys 
+        """
+        names = [key for key,ev in self.items() if isinstance(ev.data, pd.DataFrame)]
+        if(not names):
+            return np.empty((0, 0 if x_grid is None else len(x_grid)), dtype = dtype), names, x_grid
+        if(x_grid is None):
+            x_grid = self[names[0]].data[x].to_numpy(dtype = float)
+        x_grid = np.asarray(x_grid, dtype = float)
+        matrix = np.empty((len(names), x_grid.size), dtype = dtype)
+
+        #events grouped by x. Events on x_grid are copied
+        groups = {}
+        positions = {}
+        for row, key in enumerate(names):
+            data = self[key].data
+            #to_numpy is a view for tables with one dtype (fityk files)
+            layout = tuple(data.columns)
+            if(layout not in positions):
+                positions[layout] = (data.columns.get_loc(x), data.columns.get_loc(column))
+            table = data.to_numpy()
+            ev_x = table[:,positions[layout][0]].astype(float, copy = False)
+            values = table[:,positions[layout][1]]
+            if(ev_x.size == x_grid.size and np.array_equal(ev_x, x_grid)):
+                matrix[row] = values
+                continue
+            candidates = groups.setdefault((ev_x.size, ev_x[0] if ev_x.size else None, ev_x[-1] if ev_x.size else None), [])
+            for group_x, rows in candidates:
+                if(np.array_equal(group_x, ev_x)):
+                    rows.append((row, values))
+                    break
+            else:
+                candidates.append((ev_x, [(row, values)]))
+
+        for candidates in groups.values():
+            for group_x, rows in candidates:
+                if(group_x.size == 0):
+                    matrix[[row for row,_ in rows]] = np.nan
+                    continue
+                order, left, weight, outside = _interpolation(group_x, x_grid, method)
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    values = np.stack([v for _,v in chunk]).astype(float, copy = False)
+                    if(order is not None):
+                        values = values[:,order]
+                    right = np.minimum(left + 1, group_x.size - 1)
+                    #terms with zero weight are skipped: a NaN neighbour must not hide the other point
+                    result = np.where(weight == 1, 0, values[:,left]*(1 - weight)) + np.where(weight == 0, 0, values[:,right]*weight)
+                    result[:,outside] = np.nan
+                    matrix[[row for row,_ in chunk]] = result
+        return matrix, names, x_grid
+
+    @instrument()
+    def subtract_background(self, pattern = "Bg", to_background = ["y","ftot"], x = "x", drop = False, inplace = False):
+        """
+        Subtract the background from the data of all the events. The 
+        background is the sum of the columns matching pattern (see 
+        event_operations.background). Events with the same column layout 
+        are processed together as one array.
+
+        Input
+        -----------------------------------------------------------------
+        pattern: str (regular expression), default "Bg"
+            selects the background columns using re.search
+        to_background: None, str or list, default: ["y","ftot"]
+            columns to which the background is subtracted. None selects 
+            all the columns apart from x
+        x: str, default "x"
+            x column, used when to_background is None
+        drop: bool, default False
+            drop the background columns
+        inplace: bool, default False
+            if True the tables replace the events data (lazy events are
+            loaded)
+
+        Return
+        -----------------------------------------------------------------
+        dict or None:
+            DataFrame of each event key. None if inplace
+        """
+        if(isinstance(to_background, str)):
+            to_background = [to_background]
+
+        tables = {}
+        for keys, frames, columns, numeric, block in _data_blocks(self.items()):
+            #background and target columns resolved once for each layout
+            labels = [c for c in columns if re.search(pattern, str(c))]
+            targets = [c for c in columns if c != x] if to_background is None else to_background
+            bg = np.nansum(block[:,:,_positions(columns, numeric, labels, "pattern")], axis = 2)
+            block[:,:,_positions(columns, numeric, targets, "to_background")] -= bg[:,:,None]
+            layout_tables = _from_block(frames, columns, numeric, block)
+            if(drop):
+                layout_tables = [df.drop(columns = labels) for df in layout_tables]
+            tables.update(zip(keys, layout_tables))
+        return self._assign_data(tables, inplace)
 
 
 
@@ -107,7 +981,8 @@ class Experiment(dict):
     # Loaders
     # -----------------------------------------------------------------
 
-    def load_data(self, files, folder = True, extension = "", header = "fityk", flag=None, **kwargs):
+    @instrument()
+    def load_data(self, files, folder = True, extension = "", header = "fityk", flag=None, workers = None, executor = "process", lazy = False, cache = False, **kwargs):
         """
         Create events for each file.
 
@@ -125,6 +1000,25 @@ class Experiment(dict):
             a flag or a list of flags can be passed to handle special cases
             Accepted values:
                 -"pressure": adds Pid tocken if found
+        workers: int or None, default = None
+            number of workers used to parse the files at the same time. 
+            None reads the files one after the other. Events are added in 
+            the order of files. As with workers=None, the events of files 
+            with a wrong custom header are created without data and the 
+            other errors are raised.
+        executor: str, default = "process"
+            pool used when workers is given: "process" or "thread". The 
+            process pool falls back to threads if it is not available.
+        lazy: bool, default = False
+            if True the data files are read when Event.data is accessed 
+            and the least recently used data are released from memory 
+            (see lazy.set_cache_size). Casaxps files are still parsed 
+            once for their functions and attributes.
+        cache: bool, str or FileCache, default = False
+            keep the parsed files in an on-disk cache and read them from 
+            it while they are not modified (see cache.FileCache). True 
+            uses cache.file_cache, a str is the cache folder. Not used 
+            with lazy=True
         **kwargs:
             keyword arguments to pass to read custom data structures. 
             See pandas.read_table for accepted values.
@@ -138,16 +1032,78 @@ class Experiment(dict):
                 files = [files]
         flag = accept_event_flags(flag, ["pressure"])
 
+        if(lazy):
+            self._load_data_lazy(files, extension, header, flag, kwargs)
+            return
+
+        cache = _get_cache(cache)
+        if(cache is not None):
+            self._load_data_cached(files, extension, header, flag, workers, executor, cache, kwargs)
+            return
+
+        if(workers is not None and workers > 1):
+            self._load_data_parallel(files, extension, header, flag, workers, executor, kwargs)
+            return
+
         for f in files:
             #strip the file name and create an event with the name 
             name = strip_path(f, extension=extension)
             if(name not in self):
-                ev = Event(f, name=name, header=header, flag=flag, **kwargs)
+                ev = Event(f, name=name, header=header, flag=flag, tokenizer=self.tokenizer, **kwargs)
                 self[ev.name] = ev
             else:
                 self[name].get_data(f,header=header, **kwargs)
 
-    def load_peaks(self,files, folder=True, extension=".peaks", errors=True, rename_data_columns=True):
+    def _load_data_lazy(self, files, extension, header, flag, kwargs):
+        """Lazy part of load_data. See load_data for the inputs."""
+        for f in files:
+            name = strip_path(f, extension=extension)
+            if(name not in self):
+                ev = Event(name=name, flag=flag, tokenizer=self.tokenizer)
+                self[ev.name] = ev
+            else:
+                ev = self[name]
+            if(header == "casaxps"):
+                ev.get_data(f, header=header, **kwargs)
+            ev.set_data_source(DataFileSource(f, header, kwargs))
+
+    def _load_data_parallel(self, files, extension, header, flag, workers, executor, kwargs):
+        """Parallel part of load_data. See load_data for the inputs."""
+        results = parallel_map(_read_data_job, [(f, header, kwargs) for f in files], workers, executor)
+        self._add_parsed_data(files, results, extension, header, flag)
+
+    def _load_data_cached(self, files, extension, header, flag, workers, executor, cache, kwargs):
+        """Part of load_data using a FileCache. See load_data for the inputs."""
+        options = (header, sorted(kwargs.items()))
+        results = [(cache.get(f, "data", options), None) for f in files]
+        missing = [i for i,(parsed,_) in enumerate(results) if parsed is None]
+        parsed = parallel_map(_read_data_job, [(files[i], header, kwargs) for i in missing], workers, executor)
+        for i, result in zip(missing, parsed):
+            if(result[1] is None):
+                cache.put(files[i], "data", result[0], options)
+            results[i] = result
+        self._add_parsed_data(files, results, extension, header, flag)
+
+    def _add_parsed_data(self, files, results, extension, header, flag):
+        """
+        Set the (parsed, error) results of read_data to the events of 
+        files. Errors are handled as in Event.get_data: a wrong custom 
+        header is printed and leaves the data untouched, the others are 
+        raised.
+        """
+        for f, (parsed, error) in zip(files, results):
+            if(error is not None and (header in _header_formats or not isinstance(error, ValueError))):
+                raise error
+            name = strip_path(f, extension=extension)
+            if(name not in self):
+                self[name] = Event(name=name, flag=flag, tokenizer=self.tokenizer)
+            if(error is None):
+                self[name].set_data(*parsed)
+            else:
+                print(error)
+
+    @instrument()
+    def load_peaks(self,files, folder=True, extension=".peaks", errors=True, rename_data_columns=True, cache=False):
         """
         Matches function files to the events. If extension .peaks is used,
         files are assumed to be fityk function files.
@@ -165,6 +1121,8 @@ class Experiment(dict):
         rename_data_columns: bool, default = True
             calls the function rename_data_columns of Event. Works only if the 
             extension is ".peaks" (Fityk functions table)
+        cache: bool, str or FileCache, default = False
+            keep the parsed files in an on-disk cache. See load_data
 
         Return 
         -----------------------------------------------------------------
@@ -178,26 +1136,142 @@ class Experiment(dict):
             if(isinstance(files, str)):
                 files = [files]
 
+        matched, not_found = self._match_files(files, extension)
+
+        if(extension == ".peaks" and matched):
+            cache = _get_cache(cache)
+            functions = {}
+            if(cache is not None):
+                for name, f in matched.items():
+                    function = cache.get(f, "peaks", (errors,))
+                    if(function is not None):
+                        functions[name] = function
+            #all the other files are parsed together
+            missing = [name for name in matched if name not in functions]
+            for name, function in zip(missing, read_peaks([matched[name] for name in missing], errors)):
+                functions[name] = function
+                if(cache is not None):
+                    cache.put(matched[name], "peaks", function, (errors,))
+            self._set_functions({name:functions[name] for name in matched})
+        self._report_not_found(not_found)
+
+    def _match_files(self, files, extension):
+        """Return ({event name: file}, names without event) for the files of load_peaks."""
         not_found = []
+        matched = {}
         for f in files:
             name = strip_path(f, extension)
             if(not name in self): 
                 not_found += [name]
+            else:
+                matched[name] = f
+        return matched, not_found
 
-            elif(extension == ".peaks"):
-                self[name].read_fityk(f, errors)
-                self[name].rename_data_columns()
+    def _set_functions(self, functions):
+        """Set the functions read by load_peaks ({event name: DataFrame})."""
+        for name, function in functions.items():
+            self[name].function = function
+            self[name].rename_data_columns()
 
+    def _report_not_found(self, not_found):
+        """End of load_peaks."""
         if(not_found):
             print(f"{len(not_found)} files did not find a match when loading peaks.")
             print(*not_found, sep = "\n")
 
-        self.tidy_functions()
+        self._track_functions()
 
+    @instrument()
+    async def aload_data(self, files, folder = True, extension = "", header = "fityk", flag = None, concurrency = 16, executor = None, **kwargs):
+        """
+        Asynchronous version of load_data for files with a slow access 
+        (e.g. network file systems). The files are read by a pool of 
+        concurrency threads and each file is parsed, from its content in 
+        memory, as soon as it is read: reading and parsing overlap.
+        e.g.:
+            await ex.aload_data(folder, extension = ".dat")
+            asyncio.run(ex.aload_data(folder, extension = ".dat"))
+
+        Input
+        -----------------------------------------------------------------
+        files, folder, extension, header, flag, **kwargs:
+            see load_data. Casaxps files are read by the parser
+        concurrency: int, default = 16
+            maximum number of files read or parsed at the same time
+        executor: concurrent.futures.Executor or None, default = None
+            executor parsing the files. None uses the default executor 
+            of the event loop (threads)
+        """
+        loop = asyncio.get_running_loop()
+        if(folder):
+            files = await loop.run_in_executor(None, folder_to_files, files, extension)
+        elif(isinstance(files, str)):
+            files = [files]
+        flag = accept_event_flags(flag, ["pressure"])
+
+        semaphore = asyncio.Semaphore(concurrency)
+        with ThreadPoolExecutor(concurrency) as readers:
+            async def load(f):
+                async with semaphore:
+                    try:
+                        content = f if header == "casaxps" else await loop.run_in_executor(readers, _read_bytes, f)
+                        return (await loop.run_in_executor(executor, _parse_data_job, (content, header, kwargs)), None)
+                    except Exception as er:
+                        return (None, er)
+            results = await asyncio.gather(*(load(f) for f in files))
+        self._add_parsed_data(files, results, extension, header, flag)
+
+    @instrument()
+    async def aload_peaks(self, files, folder = True, extension = ".peaks", errors = True, rename_data_columns = True, concurrency = 16, executor = None, batch_size = 64):
+        """
+        Asynchronous version of load_peaks. The files are read by a pool 
+        of concurrency threads and parsed by batches of batch_size files 
+        (see read_peaks) while the others are read. See aload_data.
+
+        Input
+        -----------------------------------------------------------------
+        files, folder, extension, errors, rename_data_columns:
+            see load_peaks
+        concurrency: int, default = 16
+            maximum number of files read at the same time
+        executor: concurrent.futures.Executor or None, default = None
+            executor parsing the files. None uses the default executor 
+            of the event loop (threads)
+        batch_size: int, default = 64
+            number of files parsed together
+        """
+        loop = asyncio.get_running_loop()
+        if(folder):
+            files = await loop.run_in_executor(None, folder_to_files, files, extension)
+        elif(isinstance(files, str)):
+            files = [files]
+        matched, not_found = self._match_files(files, extension)
+
+        if(extension == ".peaks" and matched):
+            semaphore = asyncio.Semaphore(concurrency)
+            names = list(matched)
+            with ThreadPoolExecutor(concurrency) as readers:
+                async def read(f):
+                    async with semaphore:
+                        return await loop.run_in_executor(readers, _read_bytes, f)
+                async def load(batch):
+                    contents = await asyncio.gather(*(read(matched[name]) for name in batch))
+                    return await loop.run_in_executor(executor, _parse_peaks_job, (contents, errors))
+                batches = [names[i:i + batch_size] for i in range(0, len(names), batch_size)]
+                results = await asyncio.gather(*(load(batch) for batch in batches))
+            self._set_functions(dict(zip(names, (function for result in results for function in result))))
+        self._report_not_found(not_found)
+
+    @instrument(nbytes = argument_size(1, "pfile"))
     def load_pressure(self,pfile,col_name = 0, col_value = 1, col_errors = -1,force_reload = False,**args):
         """
         Read a pressure file and try to match the event name or Pid with 
         a pressure in the file. If P is already present in self.attributes  
+        the event is skipped unless force_reload is True.
+        The names of the pressure file are indexed once: an event matches
+        the row with its exact name, otherwise the rows having its Pid as 
+        a token (parts of the name split by "_") or, if there are none, 
+        containing the Pid. 
 
         Input
         -----------------------------------------------------------------
@@ -215,32 +1289,54 @@ class Experiment(dict):
             True will not consider if P is already present in self.attributes
         args: 
             named arguments to be passed to pd.read_table 
+
+        Return
+        -----------------------------------------------------------------
+        DataFrame:
+            events that could not be matched with columns event, Pid, 
+            issue ("no match" or "multiple matches") and matches (names 
+            of the matching rows)
         """
         pressures = pd.read_table(pfile, **args)
-        for i in self.values():
+        names = pressures.iloc[:,col_name].astype(str)
+        values = pressures.iloc[:,col_value].to_numpy()
+        errors = pressures.iloc[:,col_errors].to_numpy() if col_errors>=0 else None
+        exact = _name_index(names)
+        tokens = _name_index(names, tokens = True)
+        substrings = {}
+
+        issues = []
+        for key, i in self.items():
             #check if P is already present in the attributes unless force_reload is present
             if("P" in i.attributes and (not force_reload)):
                 continue
 
             #first try to see if the event name matches any instances of the pressure file. 
             #otherwise try to match Pid
-            if(i.name in pressures.iloc[col_name]):
-                match = pressures.loc[pressures.iloc[col_name] == i.name]
-            else:
-                pid = i.attributes.get("Pid")
-                if(pid is not None):
-                    #check if the pid is present in the pressure name 
-                    match = pressures.loc[[pid in x for x in pressures.iloc[:,col_name]]]
-                else: 
-                    match = None
-            if(match is None):
-                print(f"No matches found for {i.name}.")
-            elif(len(match) >1):
-                print(f"Multiple matches for {i.name}. Exact match can not be determined.")
+            pid = i.attributes.get("Pid")
+            rows = exact.get(i.name)
+            if(rows is None and pid is not None):
+                rows = tokens.get(pid)
+                if(rows is None):
+                    #check if the pid is present in the pressure name. Done once for each Pid
+                    if(pid not in substrings):
+                        substrings[pid] = np.flatnonzero(names.str.contains(pid, regex = False)).tolist()
+                    rows = substrings[pid]
+
+            if(not rows):
+                issues.append((key, pid, "no match", []))
+            elif(len(rows) > 1):
+                issues.append((key, pid, "multiple matches", names.iloc[rows].tolist()))
             else:
-                i.attributes["P"] = match.iloc[0,col_value]
-                if(col_errors>=0): i.attributes["errP"] = match.iloc[0,col_errors]
-        self.tidy_functions()
+                i.attributes["P"] = values[rows[0]]
+                if(col_errors>=0): i.attributes["errP"] = errors[rows[0]]
+
+        issues = pd.DataFrame(issues, columns = ["event", "Pid", "issue", "matches"])
+        if(len(issues)):
+            counts = issues["issue"].value_counts()
+            print(f"No pressure for {len(issues)} events: {counts.get('no match', 0)} without match, {counts.get('multiple matches', 0)} with multiple matches.")
+        self._track_functions()
+        return issues
 
 
 
@@ -308,24 +1404,46 @@ class Experiment(dict):
         return json.dumps({key:value.to_dict() for key,value in self.items()},**kwds) 
 
     # json file out
-    def save(self,filename, indent = "\t", **kwds):
+    @instrument()
+    def save(self,filename, indent = "\t", format = "json", **kwds):
         """
-        Save to a json file. 
+        Save to a json file. The events are converted and written one at a 
+        time so the whole document is never held in memory. The file is 
+        the same json object written by json.dump.
         Input
         --------------------------
         filename: str
             file name to save
         indent: str
             formatting option for the indentation in json.dump
+        format: str, default = "json"
+            - "json": human readable json file
+            - "npz": binary file storing the data and function tables of 
+              all the events as typed arrays. Much faster to read, see 
+              storage.write_npz
         kwds:
-            passed to json.dump 
+            passed to json.dumps for each event or to storage.write_npz 
+            (e.g. compress = True)
 
 
         """
+        if(format == "npz"):
+            return write_npz(filename, self, **kwds)
+        elif(format != "json"):
+            raise ValueError(f"Unknown format {format}. Accepted values are 'json' and 'npz'.")
         if(not filename.endswith(".json")):
             filename += ".json"
+        if(isinstance(indent, int)):
+            indent = " " * indent
+        # mimic the layout of json.dump
+        newline = "\n" + indent if indent is not None else ""
+        separator = "," if indent is not None else ", "
         with open(filename,"w") as f:
-            return json.dump({key:value.to_dict() for key,value in self.items()},f, indent = indent, **kwds) 
+            f.write("{")
+            for i,(key,value) in enumerate(self.items()):
+                event = json.dumps(value.to_dict(), indent = indent, **kwds)
+                f.write((separator if i else "") + newline + json.dumps(str(key)) + ": " + event.replace("\n", newline))
+            f.write("\n}" if indent is not None and len(self) else "}")
 
     def __repr__(self):
         return "-"*30 + "\n" + "\n".join([f"{v}\n" + "-"*30 for v in self.values()])
\ No newline at end of file
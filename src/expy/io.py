@@ -1,8 +1,12 @@
 import json 
 import pickle
 import os
+import re
+import codecs
 import pandas as pd
 from expy import Experiment, Event
+from expy.storage import NpzStore
+from expy import profiling
 
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,18 +24,178 @@ def open_pickle(filename):
     with open(filename,"rb") as f:
         return pickle.load(f)
 
-def read(filename):
+@profiling.instrument(nbytes = profiling.argument_size(), rows = len)
+def read(filename, lazy = False):
     """
-    Read the Experiment from a json file. 
+    Read the Experiment from a json file. Files with extension .npz are
+    read with read_npz.
+
+    Input
+    --------------------------
+    filename: str
+        json file written by Experiment.save
+    lazy: bool, default = False
+        if True the data of the events are not kept in memory. Each 
+        event reads its data from the file when Event.data is accessed 
+        (see lazy.set_cache_size)
     """
+    if(filename.endswith(".npz")):
+        return read_npz(filename, lazy = lazy)
     ex = Experiment()
-    with open(filename) as f:
-        d = json.load(f)
-    for key,value in d.items():
-        ex[key] = read_event(value, flag = "read_json_file")
+    for key,value in iter_events(filename, lazy = lazy):
+        ex[key] = value
+    ex.tidy_functions()
+    return ex
+
+@profiling.instrument(nbytes = profiling.argument_size(), rows = len)
+def read_npz(filename, lazy = False):
+    """
+    Read the Experiment from a npz file written by 
+    Experiment.save(format = "npz").
+
+    Input
+    --------------------------
+    filename: str
+        npz file
+    lazy: bool, default = False
+        if True the data of the events are read from the memory mapped 
+        file when Event.data is accessed 
+    """
+    store = NpzStore(filename)
+    ex = Experiment(name = store.meta["name"])
+    for key,value in store.events(lazy = lazy):
+        ex[key] = value
+    store.close()
     ex.tidy_functions()
     return ex
 
+def iter_events(filename, lazy = False, chunk_size = 1 << 20):
+    """
+    Iterate over the events of a json file written by Experiment.save 
+    without loading the whole file. Only one event at a time is parsed.
+
+    Input
+    --------------------------
+    filename: str
+        json file 
+    lazy: bool, default = False
+        see read
+    chunk_size: int, default = 1MB
+        number of bytes read from the file at a time
+
+    Yields
+    --------------------------
+    tuple
+        (key, Event)
+    """
+    with open(filename, "rb") as f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect("{")
+        if(stream.peek() == "}"):
+            return
+        while True:
+            key, _, _ = stream.value()
+            stream.expect(":")
+            value, start, end = stream.value()
+            if(lazy):
+                value.pop("data", None)
+                ev = read_event(value, flag = "read_json_file")
+                ev.set_data_source(JsonDataSource(filename, start, end - start))
+            else:
+                ev = read_event(value, flag = "read_json_file")
+            del value
+            yield key, ev
+            if(stream.peek() == "}"):
+                return
+            stream.expect(",")
+
+class JsonDataSource:
+    """
+    Data of an event stored in a json file written by Experiment.save. 
+    Used by read with lazy=True.
+    """
+    def __init__(self, filename, offset, length):
+        """
+        Input
+        --------------------------
+        filename: str
+            json file 
+        offset: int
+            position in bytes of the event in the file 
+        length: int
+            length in bytes of the event
+        """
+        self.filename = filename
+        self.offset = offset
+        self.length = length
+
+    def load(self):
+        """Return the data table of the event."""
+        with open(self.filename, "rb") as f:
+            f.seek(self.offset)
+            dic = json.loads(f.read(self.length))
+        data = dic.get("data")
+        return pd.DataFrame(**data) if data else None
+
+class _JsonStream:
+    """Read the elements of a json file one by one. Used by iter_events."""
+    _whitespace = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, f, chunk_size):
+        self.file = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0        # position in self.buffer
+        self.offset = 0     # bytes before self.buffer in the file
+        self.eof = False
+
+    def _read(self, size):
+        """Append size bytes to the buffer. Return False at the end of the file."""
+        if(self.eof):
+            return False
+        # drop what has been parsed already
+        self.offset += len(self.buffer[:self.pos].encode("utf-8"))
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        chunk = self.file.read(size)
+        self.eof = not chunk
+        self.buffer += self.decoder.decode(chunk, final = self.eof)
+        return True
+
+    def peek(self):
+        """Return the next non whitespace character ("" at the end of the file)."""
+        while True:
+            self.pos = self._whitespace.match(self.buffer, self.pos).end()
+            if(self.pos < len(self.buffer) or not self._read(self.chunk_size)):
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if(self.peek() != char):
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode the next json value. Return (value, start, end) with positions in bytes."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+                # numbers could continue in the next chunk
+                if(end < len(self.buffer) or self.eof):
+                    break
+            except json.JSONDecodeError:
+                if(self.eof):
+                    raise
+            self._read(size)
+            size *= 2
+        start = self.offset + len(self.buffer[:self.pos].encode("utf-8"))
+        length = len(self.buffer[self.pos:end].encode("utf-8"))
+        self.pos = end
+        return value, start, start + length
+
 def read_event(dic, flag = None):
     """
     Parse keywords from a dictionary and creates an event.
@@ -0,0 +1,90 @@
+import weakref
+from collections import OrderedDict
+
+
+class DataCache:
+    """
+    Least recently used list of the events holding a lazily loaded
+    Event.data. When more than maxsize events have their data in memory,
+    the data of the least recently used one is released and will be
+    loaded again from its source on the next access.
+    """
+    def __init__(self, maxsize = 256):
+        """
+        Input
+        -----------------------------------------------------------------
+        maxsize: int or None, default 256
+            maximum number of data tables kept in memory. None means no
+            limit
+        """
+        self.maxsize = maxsize
+        self._events = OrderedDict()
+
+    def touch(self, event):
+        """Mark the data of event as the most recently used one."""
+        key = id(event)
+        ref = self._events.get(key)
+        if ref is not None and ref() is event:
+            self._events.move_to_end(key)
+        else:
+            # ids can be reused by new events
+            self._events[key] = weakref.ref(event)
+            self._events.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while self.maxsize is not None and len(self._events) > self.maxsize:
+            _, ref = self._events.popitem(last = False)
+            event = ref()
+            if event is not None:
+                event.release_data()
+
+    def discard(self, event):
+        """Remove event from the list."""
+        self._events.pop(id(event), None)
+
+    def clear(self):
+        """Release the data of all the lazy events."""
+        maxsize = self.maxsize
+        self.maxsize = 0
+        self._evict()
+        self.maxsize = maxsize
+
+    def __len__(self):
+        return len(self._events)
+
+
+# shared by all the events
+data_cache = DataCache()
+
+def set_cache_size(maxsize):
+    """
+    Set the maximum number of lazily loaded data tables kept in memory.
+    See DataCache.
+    """
+    data_cache.maxsize = maxsize
+    data_cache._evict()
+
+
+class EditedSource:
+    """
+    Source of lazy data applying in place edits after loading. Used to
+    keep the changes made to the data of lazy events (e.g. renamed
+    columns) when the data is loaded again.
+    """
+    def __init__(self, source, edit):
+        """
+        Input
+        -----------------------------------------------------------------
+        source: object with a load method
+            source of the data
+        edit: callable
+            function editing the loaded DataFrame in place
+        """
+        self.source = source
+        self.edit = edit
+
+    def load(self):
+        data = self.source.load()
+        self.edit(data)
+        return data
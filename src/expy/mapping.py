@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+class MapIndex:
+    """
+    Spatial index of the events of a map. The coordinates are read from
+    the events attributes (see Event.parse_pos_from_name). Built by
+    Experiment.map_index.
+    """
+    def __init__(self, experiment, columns = ("map_x","map_y")):
+        """
+        Input
+        -----------------------------------------------------------------
+        experiment: Experiment
+            events of the map. Events without coordinates are skipped
+        columns: tuple, default ("map_x","map_y")
+            attributes used as coordinates
+        """
+        self.columns = tuple(columns)
+        keys = []
+        coords = []
+        for key, ev in experiment.items():
+            pos = [ev.attributes.get(c) for c in self.columns]
+            if(None not in pos):
+                keys.append(key)
+                coords.append(pos)
+        self.keys = np.empty(len(keys), dtype = object)
+        self.keys[:] = keys
+        self.coords = np.array(coords, dtype = float).reshape(-1, len(self.columns))
+        # x sorted positions for the rectangle selections
+        self._order = np.argsort(self.coords[:,0], kind = "stable")
+        self._sorted_x = self.coords[self._order,0]
+        self._tree = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def tree(self):
+        """KD-tree of the coordinates, built on first use."""
+        if(self._tree is None):
+            self._tree = cKDTree(self.coords)
+        return self._tree
+
+    def nearest(self, point, k = 1, distance = False):
+        """
+        Events closest to point.
+
+        Input
+        -----------------------------------------------------------------
+        point: tuple or array
+            coordinates, or array (points, dimensions) for many points
+        k: int, default 1
+            number of neighbours. At most len(self) neighbours are 
+            returned
+        distance: bool, default False
+            return the distances as well
+
+        Return
+        -----------------------------------------------------------------
+        key, array of keys or (keys, distances):
+            keys of the k nearest events of each point
+        """
+        if(k > len(self)):
+            # the tree pads the missing neighbours with the index len(self)
+            k = list(range(1, len(self) + 1))
+        dist, index = self.tree.query(point, k = k)
+        keys = self.keys[index] if np.ndim(index) else self.keys[int(index)]
+        if(distance):
+            return keys, dist
+        return keys
+
+    def roi(self, xlim, ylim, zlim = None):
+        """
+        Keys of the events inside a rectangle (box for 3D maps). Limits
+        are included.
+
+        Input
+        -----------------------------------------------------------------
+        xlim, ylim, zlim: tuple
+            (min, max) of each coordinate. None leaves a side open
+        """
+        limits = [xlim, ylim] + ([zlim] if zlim is not None else [])
+        low, high = [(l[0] if l[0] is not None else -np.inf) for l in limits], [(l[1] if l[1] is not None else np.inf) for l in limits]
+        # only the events in the x range are checked
+        start = np.searchsorted(self._sorted_x, low[0], side = "left")
+        stop = np.searchsorted(self._sorted_x, high[0], side = "right")
+        candidates = self._order[start:stop]
+        coords = self.coords[candidates, 1:len(limits)]
+        inside = np.all((coords >= low[1:]) & (coords <= high[1:]), axis = 1)
+        return list(self.keys[np.sort(candidates[inside])])
+
+    def within(self, point, radius):
+        """
+        Keys of the events at a distance from point smaller or equal to 
+        radius.
+
+        Input
+        -----------------------------------------------------------------
+        point: tuple or array
+            coordinates, or array (points, dimensions) for many points
+        radius: float
+            maximum distance
+
+        Return
+        -----------------------------------------------------------------
+        list:
+            keys in the order of the events, or one such list for each 
+            point
+        """
+        index = self.tree.query_ball_point(point, radius)
+        if(np.ndim(point) > 1):
+            return [list(self.keys[np.sort(np.asarray(i, dtype = int))]) for i in index]
+        return list(self.keys[np.sort(np.asarray(index, dtype = int))])
+
+    def grid(self, decimals = None):
+        """
+        Regular grid of the map: sorted unique values of each coordinate
+        and position of each event on them.
+
+        Input
+        -----------------------------------------------------------------
+        decimals: int or None, default None
+            round the coordinates before looking for unique values
+
+        Return
+        -----------------------------------------------------------------
+        tuple:
+            (axes, positions) with axes the list of unique coordinates and
+            positions the array (events, dimensions) of indices
+        """
+        coords = self.coords if decimals is None else np.round(self.coords, decimals)
+        axes = []
+        positions = []
+        for values in coords.T:
+            axis, index = np.unique(values, return_inverse = True)
+            axes.append(axis)
+            positions.append(index)
+        return axes, np.stack(positions, axis = 1)
+
+    def rasterize(self, values, decimals = None, fill = np.nan):
+        """
+        Image of a value of the events on the map grid (2D maps).
+
+        Input
+        -----------------------------------------------------------------
+        values: Series or dict
+            value of each event key (e.g. a column of
+            Experiment.functions_flat indexed by key, see
+            Experiment.rasterize). Missing events are filled with fill
+        decimals: int or None, default None
+            see grid
+        fill: float, default NaN
+            value of the pixels without events
+
+        Return
+        -----------------------------------------------------------------
+        tuple:
+            (image, x, y). image has shape (len(y), len(x))
+        """
+        if(len(self.columns) != 2):
+            raise ValueError("rasterize needs a map with two coordinates.")
+        (x, y), positions = self.grid(decimals)
+        values = pd.Series(values, dtype = float).reindex(self.keys).to_numpy()
+        image = np.full((y.size, x.size), fill, dtype = float)
+        image[positions[:,1], positions[:,0]] = values
+        return image, x, y
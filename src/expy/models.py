@@ -0,0 +1,417 @@
+import numpy as np
+import pandas as pd
+from scipy.special import wofz
+
+#local imports
+from .event import function_column_names
+
+# -----------------------------------------------------------------
+# Fityk lineshapes
+#
+# Each lineshape takes x with shape (1, points) or (functions, points)
+# and the parameters as arrays of shape (functions, 1), so that all the
+# functions of the same type are computed in one call. Definitions and
+# parameter order are the ones of fityk.
+# -----------------------------------------------------------------
+
+_LN2 = np.log(2)
+
+def _gauss(x, center, hwhm):
+    return np.exp(-_LN2 * ((x - center) / hwhm)**2)
+
+def _lorentz(x, center, hwhm):
+    return 1 / (1 + ((x - center) / hwhm)**2)
+
+def _voigt(x, center, gwidth, shape):
+    """Real part of the Faddeeva function: unnormalized Voigt profile."""
+    return wofz((x - center) / gwidth + 1j * np.abs(shape)).real
+
+def _polynomial(x, *a):
+    y = np.zeros(np.broadcast_shapes(x.shape, a[0].shape))
+    for coefficient in reversed(a):
+        y = y * x + coefficient
+    return y
+
+LINESHAPES = {
+    "Constant": (lambda x, a0: _polynomial(x, a0), 1),
+    "Linear": (_polynomial, 2),
+    "Quadratic": (_polynomial, 3),
+    "Cubic": (_polynomial, 4),
+    "Polynomial4": (_polynomial, 5),
+    "Polynomial5": (_polynomial, 6),
+    "Polynomial6": (_polynomial, 7),
+    "Gaussian": (lambda x, height, center, hwhm: height * _gauss(x, center, hwhm), 3),
+    "GaussianA": (lambda x, area, center, hwhm: area * np.sqrt(_LN2 / np.pi) / hwhm * _gauss(x, center, hwhm), 3),
+    "SplitGaussian": (lambda x, height, center, hwhm1, hwhm2: height * _gauss(x, center, np.where(x < center, hwhm1, hwhm2)), 4),
+    "Lorentzian": (lambda x, height, center, hwhm: height * _lorentz(x, center, hwhm), 3),
+    "LorentzianA": (lambda x, area, center, hwhm: area / (np.pi * hwhm) * _lorentz(x, center, hwhm), 3),
+    "SplitLorentzian": (lambda x, height, center, hwhm1, hwhm2: height * _lorentz(x, center, np.where(x < center, hwhm1, hwhm2)), 4),
+    "PseudoVoigt": (lambda x, height, center, hwhm, shape: height * ((1 - shape) * _gauss(x, center, hwhm) + shape * _lorentz(x, center, hwhm)), 4),
+    "PseudoVoigtA": (lambda x, area, center, hwhm, shape: area / hwhm * ((1 - shape) * np.sqrt(_LN2 / np.pi) * _gauss(x, center, hwhm) + shape / np.pi * _lorentz(x, center, hwhm)), 4),
+    "Voigt": (lambda x, height, center, gwidth, shape: height * _voigt(x, center, gwidth, shape) / wofz(1j * np.abs(shape)).real, 4),
+    "VoigtA": (lambda x, area, center, gwidth, shape: area / (np.sqrt(np.pi) * gwidth) * _voigt(x, center, gwidth, shape), 4),
+    }
+
+
+def _lineshapes(lineshapes):
+    """
+    LINESHAPES completed with lineshapes ({name: lineshape name or
+    (function, number of parameters)}).
+    """
+    if(not lineshapes):
+        return LINESHAPES
+    shapes = dict(LINESHAPES)
+    for name, shape in lineshapes.items():
+        shapes[name] = LINESHAPES[shape] if isinstance(shape, str) else shape
+    return shapes
+
+def _parameters(table, n):
+    """Array (rows, n) of the parameters a0..a{n-1} of table."""
+    columns = [f"a{i}" for i in range(n)]
+    missing = [c for c in columns if c not in table.columns]
+    if(missing):
+        raise ValueError(f"Parameters {', '.join(missing)} not found in the function table.")
+    return table[columns].to_numpy(dtype = float)
+
+def _evaluate_rows(fnames, table, x, shapes):
+    """
+    Values (rows, points) of the functions of table. x has shape
+    (1, points) or (rows, points).
+    """
+    values = np.empty((len(fnames), x.shape[1]))
+    codes, names = pd.factorize(fnames)
+    unknown = [name for name in names if name not in shapes]
+    if(unknown):
+        raise ValueError(f"Unknown lineshapes: {', '.join(map(str, unknown))}. Give them with lineshapes, e.g. lineshapes = {{'{unknown[0]}':'LorentzianA'}}.")
+    for code, name in enumerate(names):
+        function, n = shapes[name]
+        rows = np.flatnonzero(codes == code)
+        parameters = _parameters(table.iloc[rows], n)
+        values[rows] = function(x if x.shape[0] == 1 else x[rows], *parameters.T[:,:,None])
+    return values
+
+def components(function, x, lineshapes = None):
+    """
+    Compute the functions of a function table (see Event.function) on x.
+    The parameters are the columns a0, a1, ... (tables read with
+    errors=True, the default of Experiment.load_peaks).
+
+    Input
+    -----------------------------------------------------------------
+    function: DataFrame
+        function table with the columns fname and a0, a1, ...
+    x: array
+        points where the functions are computed
+    lineshapes: dict or None, default None
+        lineshapes of user defined functions (fname) not in LINESHAPES.
+        The values are the name of a lineshape in LINESHAPES or a tuple
+        (function, number of parameters).
+        e.g.: {"Air":"LorentzianA", "Bg2":"Polynomial6"}
+
+    Return
+    -----------------------------------------------------------------
+    array:
+        array (functions, points), one row for each row of function
+    """
+    x = np.asarray(x, dtype = float).reshape(1, -1)
+    return _evaluate_rows(function["fname"].to_numpy(), function, x, _lineshapes(lineshapes))
+
+def _curves_table(x, values, fnames):
+    """DataFrame x, one column per function (see rename_data_columns), ftot."""
+    columns = ["x"] + function_column_names(fnames) + ["ftot"]
+    return pd.DataFrame(np.column_stack([x, values.T, values.sum(axis = 0)]), columns = columns, copy = False)
+
+def evaluate(function, x, lineshapes = None):
+    """
+    Table of the curves of the functions of function on x, with the
+    columns of a data table after Event.rename_data_columns:
+    x, one column per function and ftot. See components.
+    """
+    x = np.asarray(x, dtype = float)
+    return _curves_table(x, components(function, x, lineshapes), list(function["fname"]))
+
+def evaluate_batch(functions, x, lineshapes = None, chunk_size = 256):
+    """
+    Batch version of evaluate: the functions of chunk_size tables are
+    computed together, all the functions of a lineshape in one call.
+
+    Input
+    -----------------------------------------------------------------
+    functions: list of DataFrame
+        function tables
+    x: array or list of arrays
+        points shared by all the tables or one array for each table
+    lineshapes: dict or None, default None
+        see components
+    chunk_size: int, default 256
+        number of tables computed together. It limits the memory used
+
+    Return
+    -----------------------------------------------------------------
+    list:
+        one DataFrame for each table, see evaluate
+    """
+    functions = list(functions)
+    shapes = _lineshapes(lineshapes)
+    shared = not isinstance(x, (list, tuple))
+    if(shared):
+        x = np.asarray(x, dtype = float)
+    result = [None] * len(functions)
+
+    # tables whose points can be stacked (same number of points)
+    groups = {}
+    for i in range(len(functions)):
+        points = x if shared else np.asarray(x[i], dtype = float)
+        groups.setdefault(points.size, []).append((i, points))
+
+    for group in groups.values():
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            tables = [functions[i] for i,_ in chunk]
+            lengths = np.array([len(t) for t in tables])
+            if(lengths.sum() == 0):
+                values = np.empty((0, chunk[0][1].size))
+                fnames = np.empty(0, dtype = object)
+            else:
+                table = pd.concat(tables, ignore_index = True)
+                fnames = table["fname"].to_numpy(dtype = object)
+                if(shared):
+                    rows_x = x.reshape(1, -1)
+                else:
+                    rows_x = np.repeat(np.stack([points for _,points in chunk]), lengths, axis = 0)
+                values = _evaluate_rows(fnames, table, rows_x, shapes)
+            bounds = np.cumsum(lengths)[:-1]
+            for (i, points), rows, names in zip(chunk, np.split(values, bounds), np.split(fnames, bounds)):
+                result[i] = _curves_table(points, rows, list(names))
+    return result
+
+
+# -----------------------------------------------------------------
+# Peak properties (Center, Height, Area, FWHM) as written by fityk in
+# the peaks files. Each function takes the parameters as arrays of
+# shape (functions,). Lineshapes without an entry (e.g. polynomials)
+# have no properties.
+# -----------------------------------------------------------------
+
+def _voigt_fwhm(gwidth, shape):
+    # Olivero and Longbothum approximation, as fityk
+    fg = 2 * gwidth * np.sqrt(_LN2)
+    fl = 2 * np.abs(gwidth) * shape
+    return 0.5346 * fl + np.sqrt(0.2166 * fl**2 + fg**2)
+
+_GAUSS_AREA = np.sqrt(np.pi / _LN2)
+
+PEAK_PROPERTIES = {
+    "Gaussian": lambda h, c, w: (c, h, h * np.abs(w) * _GAUSS_AREA, 2 * np.abs(w)),
+    "GaussianA": lambda a, c, w: (c, a / (np.abs(w) * _GAUSS_AREA), a, 2 * np.abs(w)),
+    "SplitGaussian": lambda h, c, w1, w2: (c, h, h * (np.abs(w1) + np.abs(w2)) / 2 * _GAUSS_AREA, np.abs(w1) + np.abs(w2)),
+    "Lorentzian": lambda h, c, w: (c, h, h * np.pi * np.abs(w), 2 * np.abs(w)),
+    "LorentzianA": lambda a, c, w: (c, a / (np.pi * np.abs(w)), a, 2 * np.abs(w)),
+    "SplitLorentzian": lambda h, c, w1, w2: (c, h, h * np.pi * (np.abs(w1) + np.abs(w2)) / 2, np.abs(w1) + np.abs(w2)),
+    "PseudoVoigt": lambda h, c, w, s: (c, h, h * np.abs(w) * ((1 - s) * _GAUSS_AREA + s * np.pi), 2 * np.abs(w)),
+    "PseudoVoigtA": lambda a, c, w, s: (c, a / (np.abs(w) * ((1 - s) * _GAUSS_AREA + s * np.pi)), a, 2 * np.abs(w)),
+    "Voigt": lambda h, c, g, s: (c, h, h * np.abs(g) * np.sqrt(np.pi) / wofz(1j * np.abs(s)).real, _voigt_fwhm(g, s)),
+    "VoigtA": lambda a, c, g, s: (c, a / (np.abs(g) * np.sqrt(np.pi)) * wofz(1j * np.abs(s)).real, a, _voigt_fwhm(g, s)),
+    }
+
+def _canonical(fname, lineshapes):
+    """Name in LINESHAPES of the lineshape of fname or None."""
+    shape = (lineshapes or {}).get(fname, fname)
+    return shape if isinstance(shape, str) else None
+
+def peak_properties(function, lineshapes = None):
+    """
+    Center, Height, Area and FWHM of the functions of a function table
+    computed from the parameters a0, a1, ... as fityk does. NaN for the
+    functions that are not peaks.
+
+    Input
+    -----------------------------------------------------------------
+    function: DataFrame
+        function table
+    lineshapes: dict or None, default None
+        see components
+
+    Return
+    -----------------------------------------------------------------
+    DataFrame:
+        columns Center, Height, Area, FWHM with the index of function
+    """
+    properties = np.full((len(function), 4), np.nan)
+    fnames = function["fname"].to_numpy()
+    codes, names = pd.factorize(fnames)
+    for code, name in enumerate(names):
+        shape = _canonical(name, lineshapes)
+        if(shape not in PEAK_PROPERTIES):
+            continue
+        rows = np.flatnonzero(codes == code)
+        parameters = _parameters(function.iloc[rows], LINESHAPES[shape][1])
+        properties[rows] = np.column_stack(np.broadcast_arrays(*PEAK_PROPERTIES[shape](*parameters.T)))
+    return pd.DataFrame(properties, index = function.index, columns = ["Center", "Height", "Area", "FWHM"])
+
+
+# -----------------------------------------------------------------
+# Fit
+# -----------------------------------------------------------------
+
+class SumModel:
+    """
+    Sum of the functions of a function table as a function of the vector
+    of all their parameters (a0, a1, ... of each row one after the
+    other). Used by fit.
+    """
+    def __init__(self, fnames, lineshapes = None):
+        """
+        Input
+        -----------------------------------------------------------------
+        fnames: list
+            fname of each function
+        lineshapes: dict or None, default None
+            see components
+        """
+        shapes = _lineshapes(lineshapes)
+        self.fnames = tuple(fnames)
+        unknown = sorted({name for name in self.fnames if name not in shapes}, key = str)
+        if(unknown):
+            raise ValueError(f"Unknown lineshapes: {', '.join(map(str, unknown))}. Give them with lineshapes, e.g. lineshapes = {{'{unknown[0]}':'LorentzianA'}}.")
+        sizes = [shapes[name][1] for name in self.fnames]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        self.size = int(self.offsets[-1])
+        # functions of the same lineshape are computed together:
+        # (function, positions (functions, parameters) in the vector)
+        self.groups = []
+        codes, names = pd.factorize(np.asarray(self.fnames, dtype = object))
+        for code, name in enumerate(names):
+            function, n = shapes[name]
+            rows = np.flatnonzero(codes == code)
+            self.groups.append((function, self.offsets[rows][:,None] + np.arange(n)))
+
+    def parameters(self, function, fixed = None):
+        """
+        Vector of the parameters of a function table and mask of the free
+        ones. The fixed parameters are those in fixed and those with a 
+        NaN error.
+
+        Input
+        -----------------------------------------------------------------
+        function: DataFrame
+            function table
+        fixed: dict or None, default None
+            {fid: positions of the fixed parameters}. None uses the 
+            parameters fixed in fityk kept by read_peaks in 
+            function.attrs["fixed"]
+        """
+        if(fixed is None):
+            fixed = function.attrs.get("fixed", {})
+        values = np.empty(self.size)
+        free = np.ones(self.size, dtype = bool)
+        for i, n in enumerate(np.diff(self.offsets)):
+            row = function.iloc[i]
+            values[self.offsets[i]:self.offsets[i + 1]] = [row[f"a{j}"] for j in range(n)]
+            free[self.offsets[i]:self.offsets[i + 1]] = [not (f"err_a{j}" in row.index and pd.isna(row[f"err_a{j}"])) for j in range(n)]
+            for j in fixed.get(row["fid"], ()):
+                if(j < n):
+                    free[self.offsets[i] + j] = False
+        return values, free
+
+    def __call__(self, p, x):
+        x = x.reshape(1, -1)
+        y = np.zeros(x.shape[1])
+        for function, positions in self.groups:
+            y += function(x, *p[positions].T[:,:,None]).sum(axis = 0)
+        return y
+
+    def jacobian(self, p, x):
+        """
+        Forward difference jacobian (points, parameters). Each function
+        only depends on its parameters: the values with each parameter
+        moved are computed in one call per lineshape.
+        """
+        x = x.reshape(1, -1)
+        jac = np.empty((x.shape[1], self.size))
+        for function, positions in self.groups:
+            values = p[positions]
+            k, n = values.shape
+            step = np.sqrt(np.finfo(float).eps) * np.maximum(np.abs(values), 1)
+            moved = values[:,None,:] + np.eye(n)[None] * step[:,:,None]
+            parameters = np.concatenate([values[:,None,:], moved], axis = 1).reshape(-1, n)
+            y = function(x, *parameters.T[:,:,None]).reshape(k, n + 1, -1)
+            jac[:, positions.ravel()] = ((y[:,1:] - y[:,:1]) / step[:,:,None]).reshape(k * n, -1).T
+        return jac
+
+
+def fit(model, x, y, p0, free = None, method = "lm", **kwargs):
+    """
+    Least squares fit of y with model (see SumModel) using 
+    scipy.optimize.least_squares.
+
+    Input
+    -----------------------------------------------------------------
+    model: SumModel
+        model fitted
+    x, y: array
+        data
+    p0: array
+        initial parameters
+    free: array of bool or None, default None
+        parameters changed by the fit. None means all
+    method: str, default "lm"
+        see scipy.optimize.least_squares
+    **kwargs:
+        passed to scipy.optimize.least_squares. By default the jacobian
+        is SumModel.jacobian
+
+    Return
+    -----------------------------------------------------------------
+    tuple:
+        (parameters, errors, result). errors are the standard errors 
+        (NaN for the fixed parameters) and result the OptimizeResult
+    """
+    from scipy.optimize import least_squares
+    p0 = np.asarray(p0, dtype = float)
+    free = np.ones(p0.size, dtype = bool) if free is None else np.asarray(free, dtype = bool)
+    p = p0.copy()
+
+    def residuals(q):
+        p[free] = q
+        return model(p, x) - y
+    def jacobian(q):
+        p[free] = q
+        return model.jacobian(p, x)[:, free]
+
+    jac = kwargs.pop("jac", jacobian)
+    result = least_squares(residuals, p0[free], jac = jac, method = method, **kwargs)
+    p[free] = result.x
+    errors = np.full(p.size, np.nan)
+    dof = y.size - result.x.size
+    if(dof > 0):
+        # standard errors: sqrt(diag(cov)) with the variance of the residuals
+        cov = np.linalg.pinv(result.jac.T @ result.jac) * 2 * result.cost / dof
+        errors[free] = np.sqrt(np.abs(np.diag(cov)))
+    return p, errors, result
+
+
+def fitted_table(function, model, parameters, errors, lineshapes = None, free = None):
+    """
+    Copy of the function table with the parameters (and errors) of a fit 
+    of model, in the layout of Event.read_fityk: a0, err_a0, ... and the 
+    peak properties Center, Height, Area, FWHM. The errors of the 
+    parameters that are not free keep the values of function.
+    """
+    table = function.copy()
+    sizes = np.diff(model.offsets)
+    rows = np.repeat(np.arange(len(sizes)), sizes)
+    columns = np.arange(model.size) - np.repeat(model.offsets[:-1], sizes)
+    kept = np.zeros((len(sizes), sizes.max(initial = 0)), dtype = bool)
+    if(free is not None):
+        kept[rows, columns] = ~np.asarray(free, dtype = bool)
+    for name, vector in [("a", parameters), ("err_a", errors)]:
+        matrix = np.full((len(sizes), sizes.max(initial = 0)), np.nan)
+        matrix[rows, columns] = vector
+        for j in range(matrix.shape[1]):
+            if(f"{name}{j}" in table.columns):
+                table[f"{name}{j}"] = matrix[:, j] if name == "a" else np.where(kept[:, j], table[f"{name}{j}"], matrix[:, j])
+    properties = [c for c in ["Center", "Height", "Area", "FWHM"] if c in table.columns]
+    if(properties):
+        table[properties] = peak_properties(table, lineshapes)[properties]
+    return table
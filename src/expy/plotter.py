@@ -1,8 +1,463 @@
+import matplotlib as mpl
 import matplotlib.pyplot as plt 
 import pandas as pd
+import numpy as np
+import re
+import ast
+import hashlib
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import cycle
+from matplotlib.collections import LineCollection
+from matplotlib.colors import is_color_like, BASE_COLORS
+from matplotlib.lines import lineMarkers
 from .event_operations import *
 from copy import deepcopy
+from .profiling import instrument
 
+# -----------------------------------------------------------------
+# ylim conditions
+# -----------------------------------------------------------------
+
+# names, builtins, methods and numpy functions that can be used in ylim strings
+_ylim_names = {"df", "np"}
+_ylim_builtins = {"abs":abs, "max":max, "min":min, "len":len, "round":round}
+_ylim_methods = {
+    "max", "min", "mean", "median", "std", "sum", "abs", "quantile", 
+    "between", "isna", "notna", "isin", "clip", "diff", "shift", "idxmax", "idxmin",
+    "gt", "lt", "ge", "le", "eq", "ne", "any", "all",
+    }
+_ylim_numpy = {
+    "abs", "log", "log10", "sqrt", "exp", "isnan", "isfinite", "maximum", 
+    "minimum", "nan", "inf", "pi",
+    }
+_ylim_nodes = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call,
+    ast.keyword, ast.Attribute, ast.Subscript, ast.Slice, ast.Name, ast.Load, 
+    ast.Constant, ast.Tuple, ast.List, ast.boolop, ast.operator, ast.unaryop, ast.cmpop,
+    )
+
+def _check_ylim(tree, ylim):
+    """Raise ValueError if the parsed ylim uses anything else than df, columns, simple methods and builtins."""
+    for node in ast.walk(tree):
+        if(not isinstance(node, _ylim_nodes)):
+            raise ValueError(f"{type(node).__name__} is not allowed in ylim: {ylim}")
+        if(isinstance(node, ast.Name) and node.id not in _ylim_names and node.id not in _ylim_builtins):
+            raise ValueError(f"Unknown name {node.id} in ylim: {ylim}")
+        if(isinstance(node, ast.Attribute)):
+            if(node.attr.startswith("_")):
+                raise ValueError(f"Private attribute {node.attr} in ylim: {ylim}")
+            if(isinstance(node.value, ast.Name) and node.value.id == "np" and node.attr not in _ylim_numpy):
+                raise ValueError(f"np.{node.attr} is not allowed in ylim: {ylim}")
+        if(isinstance(node, ast.Call)):
+            if(isinstance(node.func, ast.Name) and node.func.id in _ylim_builtins):
+                continue
+            if(not isinstance(node.func, ast.Attribute)):
+                raise ValueError(f"Only methods and {', '.join(_ylim_builtins)} can be called in ylim: {ylim}")
+            if(not (isinstance(node.func.value, ast.Name) and node.func.value.id == "np") and node.func.attr not in _ylim_methods):
+                raise ValueError(f"Method {node.func.attr} is not allowed in ylim: {ylim}")
+
+@lru_cache(maxsize = 256)
+def compile_ylim(ylim):
+    """
+    Compile a ylim condition once. See plot_event.
+
+    Input
+    -----------------------------------------------------------------
+    ylim: str or callable
+        condition on the DataFrame df, e.g. "df.y > 2*df.y.median()". 
+        Only df, its columns and attributes, the methods in 
+        _ylim_methods, the builtins abs, max, min, len and round and some 
+        numpy functions (np.log, np.abs, ...) can be used. A callable is 
+        returned unchanged
+
+    Return
+    -----------------------------------------------------------------
+    callable:
+        function of the DataFrame returning the rows to exclude
+    """
+    if(callable(ylim)):
+        return ylim
+    if(not isinstance(ylim,str)):
+        raise TypeError("Wrong y limit type. str or callable expected.")
+    tree = ast.parse(ylim, mode = "eval")
+    _check_ylim(tree, ylim)
+    code = compile(tree, "<ylim>", "eval")
+    return lambda df: eval(code, {"__builtins__":{}, "np":np, **_ylim_builtins}, {"df":df})
+
+
+def _prepare_data(
+        data,
+        x = "x",
+        normalized = {"ref":"y", "exclude":"x"}, 
+        bg_pattern = None,
+        to_background = ["y","ftot"],
+        add_bg = None,
+        drop_bg = True,
+        xlim = None,
+        ylim = None,
+        ):
+    """
+    Return a copy of data with the background subtracted, the limits 
+    applied and normalized. See plot_event for the inputs.
+    """
+    df = data.copy()
+
+
+    #remove bg
+    if(bg_pattern):
+        if(isinstance(bg_pattern,(int,float))):
+            bg = bg_pattern
+        else:
+            bg, labels = background(df,bg_pattern)
+            if(drop_bg == True):
+                df.drop(labels, axis = 1, inplace = True)
+        if(to_background is None):
+            # select all columns apart for x
+            to_background = list(filter(lambda y:y!=x, df.columns))
+        df[to_background] = df[to_background].sub(bg,axis = 0)
+        if add_bg is not None:
+            if isinstance(add_bg, str):
+                df.loc[:,df.columns.str.match(add_bg)] = df.loc[:,df.columns.str.match(add_bg)].add(bg,axis = 0)
+            elif isinstance(add_bg, list):
+                df[add_bg] = df[add_bg].add(bg,axis = 0)
+            else:
+                raise TypeError("Type not allowed for add_bg. Allowed types are str and list.")
+
+    #manage x limits
+    if(xlim):
+        if(not isinstance(xlim,tuple)):
+            raise TypeError("Wrong x limit type. tuple expected.")
+        else:
+            low = xlim[0] if xlim[0] else df["x"].min()
+            high = xlim[1] if xlim[1] else df["x"].max()
+            df = df.query("(x>=@low) and (x<=@high)")
+    #manage y limits
+    if(ylim):
+        df.loc[compile_ylim(ylim)(df)] = None 
+
+
+    #normalize
+    if(normalized is not None):
+        if (isinstance(normalized, dict)):
+            if (len(normalized)!=2 or "ref" not in normalized or "exclude" not in normalized):
+                raise TypeError("Abnormal normalization dictionary. The dictionary must contain all and only the keywords ref and exclude.")
+            else:
+                ref = normalized.get("ref")
+                exclude = normalized.get("exclude")
+        elif(isinstance(normalized, (str,list))):
+            ref = normalized
+            exclude = x
+        else:
+            raise TypeError("Invalide type for normalization.")
+        df = normalize(df, ref = ref, exclude = exclude)
+    return df
+
+class PrepareCache:
+    """
+    Least recently used tables computed by prepare_data. A table is 
+    found again only for the same DataFrame object (same id, shape and 
+    columns) with the same values (see fingerprint) and the same 
+    editing parameters, so that editing a DataFrame in place computes 
+    the table again.
+    """
+    def __init__(self, maxsize = 1024):
+        """
+        Input
+        -----------------------------------------------------------------
+        maxsize: int, default 1024
+            maximum number of tables kept
+        """
+        self.maxsize = maxsize
+        self._tables = OrderedDict()
+
+    def get(self, key, data, fingerprint):
+        """Return the table stored for key if it was computed from data with the same fingerprint, otherwise None."""
+        entry = self._tables.get(key)
+        # ids can be reused by new DataFrames
+        if(entry is None or entry[0]() is not data or entry[1] != fingerprint):
+            return None
+        self._tables.move_to_end(key)
+        return entry[2]
+
+    def put(self, key, data, fingerprint, table):
+        """Store the table computed from data with the given fingerprint."""
+        self._tables[key] = (weakref.ref(data), fingerprint, table)
+        self._tables.move_to_end(key)
+        while len(self._tables) > self.maxsize:
+            self._tables.popitem(last = False)
+
+    def clear(self):
+        self._tables.clear()
+
+    def __len__(self):
+        return len(self._tables)
+
+
+# shared by plot_event and plot_stack
+prepare_cache = PrepareCache()
+
+def fingerprint(data):
+    """
+    Digest of the values of a DataFrame. It changes when the values are 
+    edited in place.
+    """
+    values = data.to_numpy()
+    if(values.dtype == object):
+        values = pd.util.hash_pandas_object(data, index = False).to_numpy()
+    return hashlib.blake2b(np.ascontiguousarray(values), digest_size = 16).digest()
+
+def _freeze(value):
+    """Hashable version of the nested dict, list and tuple parameters."""
+    if(isinstance(value, dict)):
+        return tuple((k, _freeze(v)) for k,v in value.items())
+    if(isinstance(value, (list, tuple))):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+@instrument()
+def prepare_data(
+        data,
+        x = "x",
+        normalized = {"ref":"y", "exclude":"x"}, 
+        bg_pattern = None,
+        to_background = ["y","ftot"],
+        add_bg = None,
+        drop_bg = True,
+        xlim = None,
+        ylim = None,
+        cache = True,
+        ):
+    """
+    Data editing stage of plot_event: background subtraction, limits and
+    normalization. See plot_event for the inputs. 
+    With cache=True the result is kept in prepare_cache so that plotting 
+    again the same data with the same values and parameters skips the 
+    computation. The returned table is shared by those calls and must 
+    not be modified.
+    """
+    args = (x, normalized, bg_pattern, to_background, add_bg, drop_bg, xlim, ylim)
+    if(not cache):
+        return _prepare_data(data, *args)
+    key = (id(data), data.shape, tuple(data.columns), _freeze(args))
+    digest = fingerprint(data)
+    try:
+        df = prepare_cache.get(key, data, digest)
+    except TypeError:
+        # unhashable parameters
+        return _prepare_data(data, *args)
+    if(df is None):
+        df = _prepare_data(data, *args)
+        prepare_cache.put(key, data, digest, df)
+    return df
+
+def _plot_roles(columns, x = "x", y_plot = None, ftot_plot = None, other_plot = None):
+    """
+    Assign the columns to their plotting style as plot_event does.
+
+    Return
+    -----------------------------------------------------------------
+    list:
+        (role, style, columns) in plotting order. role is "y", "ftot", 
+        a pattern of other_plot or "_rem". style is a dict as y_plot 
+    """
+    columns = [c for c in columns if c != x]
+    roles = []
+    if(y_plot is not None):
+        roles.append(("y", y_plot, ["y"]))
+        columns.remove("y")
+    if(ftot_plot is not None):
+        roles.append(("ftot", ftot_plot, ["ftot"]))
+        columns.remove("ftot")
+    if(other_plot is not None):
+        var = dict(other_plot)
+        if("_rem" not in columns):
+            remaining = var.pop("_rem",None)
+        else:
+            print("WARNING! DataFrame contains _rem column")
+            remaining = None
+        for key,value in var.items():
+            sel = [c for c in columns if re.search(key, str(c))]
+            roles.append((key, value, sel))
+            columns = [c for c in columns if c not in sel]
+        if(remaining is not None):
+            roles.append(("_rem", remaining, columns))
+    return roles
+
+# keywords of plot that LineCollection accepts (with their collection name)
+_collection_keywords = {
+    "c":"colors", "color":"colors", 
+    "lw":"linewidths", "linewidth":"linewidths",
+    "ls":"linestyles", "linestyle":"linestyles",
+    "alpha":"alpha", "label":"label", "zorder":"zorder", "rasterized":"rasterized",
+    }
+
+def _parse_format(fmt):
+    """
+    Split a plot format string (e.g. "-r", ".k", "--C1") as plt.plot 
+    does.
+
+    Return
+    -----------------------------------------------------------------
+    tuple:
+        (linestyle, marker, color). Each is None if not given. If only 
+        one of linestyle and marker is given the other is "None"
+    """
+    if(fmt not in ("0", "1") and is_color_like(fmt)):
+        return None, None, fmt
+    linestyle = marker = color = None
+    i = 0
+    while i < len(fmt):
+        if(fmt[i:i + 2] in ("--", "-.")):
+            linestyle = fmt[i:i + 2]
+            i += 2
+            continue
+        c = fmt[i]
+        if(c in ("-", ":")):
+            linestyle = c
+        elif(c in lineMarkers):
+            marker = c
+        elif(c in BASE_COLORS):
+            color = c
+        elif(c == "C"):
+            digits = re.match(r"\d+", fmt[i + 1:])
+            if(digits is None):
+                raise ValueError(f"Color cycle index missing in format string {fmt!r}")
+            color = "C" + digits.group()
+            i += len(digits.group())
+        else:
+            raise ValueError(f"Unrecognized character {c} in format string {fmt!r}")
+        i += 1
+    if(linestyle is None and marker is None):
+        linestyle = mpl.rcParams["lines.linestyle"]
+    return linestyle or "None", marker or "None", color
+
+def _style_color(pos, var):
+    """Color set by the plot format or keywords. None if the color cycle is used."""
+    if("c" in var or "color" in var):
+        return var.get("color", var.get("c"))
+    if(pos and isinstance(pos[0], str)):
+        return _parse_format(pos[0])[2]
+    return None
+
+def _stacked_curves(arrays, shifts, curves):
+    """
+    Stack the curves of a role as arrays. Events with the same number of 
+    points and curves are stacked together and shifted at once.
+
+    Input
+    -----------------------------------------------------------------
+    arrays: list of array
+        prepared data of each event as float array. The first column is x
+    shifts: array
+        shift of each event
+    curves: list
+        (event, column positions) of the role
+
+    Return
+    -----------------------------------------------------------------
+    list:
+        (order, X, Y) with X and Y of shape (curves, points) and order 
+        the positions of the curves in the role
+    """
+    groups = {}
+    start = 0
+    for i, columns in curves:
+        key = (len(arrays[i]), len(columns))
+        groups.setdefault(key, []).append((i, columns, start))
+        start += len(columns)
+
+    blocks = []
+    for (points, ncols), group in groups.items():
+        index = [i for i,_,_ in group]
+        X = np.stack([arrays[i][:,0] for i in index])
+        Y = np.stack([arrays[i][:,columns].T for i,columns,_ in group])
+        Y += shifts[index, None, None]
+        order = np.concatenate([np.arange(s, s + ncols) for _,_,s in group])
+        X = np.broadcast_to(X[:, None, :], Y.shape).reshape(-1, points)
+        blocks.append((order, X, Y.reshape(-1, points)))
+    return blocks
+
+def _plot_stack_fast(ax, frames, shifts, x, y_plot, ftot_plot, other_plot, kwargs):
+    """
+    Draw the prepared frames of plot_stack with one artist per role: a 
+    LineCollection for lines, a Line2D with the curves separated by NaN 
+    for markers. Curves without a color take the colors of the 
+    axes.prop_cycle of rcParams in the order plot_event would use them, 
+    starting from the first one. Styles that can not be batched 
+    (markers from the color cycle, extra positional arguments) are drawn 
+    one curve at a time.
+    """
+    #the frames are converted to arrays with x as first column. Columns 
+    #are assigned to the roles once for each layout
+    layouts = {}
+    arrays = []
+    events = []
+    for df in frames:
+        layout = tuple(df.columns)
+        if(layout not in layouts):
+            columns = [x] + [c for c in layout if c != x]
+            roles = [(role, style, [columns.index(c) for c in sel]) for role, style, sel in _plot_roles(columns, x, y_plot, ftot_plot, other_plot)]
+            layouts[layout] = (df.columns.get_indexer(columns), roles)
+        positions, roles = layouts[layout]
+        arrays.append(df.to_numpy(dtype = float)[:,positions])
+        events.append(roles)
+
+    #curves of each role and colors taken from the cycle in the same order as plot_event
+    roles = {}
+    colors = {}
+    color_cycle = cycle(mpl.rcParams["axes.prop_cycle"].by_key().get("color", ["k"]))
+    for i, event_roles in enumerate(events):
+        for role, style, columns in event_roles:
+            if(role not in roles):
+                roles[role] = (style, [])
+                if(_style_color(style.get("pos", []), {**style, **kwargs}) is None):
+                    colors[role] = []
+            if(columns):
+                roles[role][1].append((i, columns))
+            if(role in colors):
+                colors[role] += [next(color_cycle) for c in columns]
+
+    for role, (style, curves) in roles.items():
+        if(not curves):
+            continue
+        var = deepcopy(style)
+        var.update(kwargs)
+        pos = var.pop("pos",[])
+        blocks = _stacked_curves(arrays, shifts, curves)
+        fmt = pos[0] if pos and isinstance(pos[0], str) else ""
+        linestyle, marker, color = _parse_format(fmt) if fmt else (None, None, None)
+        batch = len(pos) == 0 or (len(pos) == 1 and fmt)
+
+        if(batch and marker in (None, "None") and linestyle != "None" and set(var) <= set(_collection_keywords)):
+            order = np.concatenate([o for o,_,_ in blocks])
+            segments = [np.stack([X, Y], axis = -1) for _,X,Y in blocks]
+            segments = segments[0] if len(segments) == 1 else [c for s in segments for c in s]
+            collection = {_collection_keywords[k]:v for k,v in var.items()}
+            if(role in colors):
+                collection["colors"] = [colors[role][o] for o in order]
+            elif("colors" not in collection):
+                collection["colors"] = color
+            if(linestyle is not None and "linestyles" not in collection):
+                collection["linestyles"] = linestyle
+            ax.add_collection(LineCollection(segments, **collection))
+        elif(batch and role not in colors):
+            nan = lambda A: np.hstack([A, np.full((len(A), 1), np.nan)]).ravel()
+            X = np.concatenate([nan(X) for _,X,_ in blocks])
+            Y = np.concatenate([nan(Y) for _,_,Y in blocks])
+            ax.plot(X, Y, *pos, **var)
+        else:
+            for order, X, Y in blocks:
+                for o, Xo, Yo in zip(order, X, Y):
+                    if(role in colors):
+                        ax.plot(Xo, Yo, *pos, **var, color = colors[role][o])
+                    else:
+                        ax.plot(Xo, Yo, *pos, **var)
+    ax.autoscale_view()
+
+
+@instrument()
 def plot_event(
         data,
         x = "x",
@@ -21,6 +476,7 @@ def plot_event(
         xlim = None,
         ylim = None,
         plot_function = "plot",
+        cache = True,
         **kwargs
         ):
     """
@@ -76,9 +532,13 @@ def plot_event(
     xlim: tuple or None, default: None
         Exclude points outside the limits given in the tuple 
         (xmin,xmax) 
-    ylim: string or None, default: None
+    ylim: string, callable or None, default: None
         Exclude points which do satisfy the condition given 
-        by the string that will be passed to eval (python build-in).
+        by the string. The string is checked and compiled once (see 
+        compile_ylim): only df, its columns, simple methods (max, 
+        mean, between, gt...) and builtins (abs, max, len...) can be 
+        used. A callable taking df and returning the points to exclude 
+        can be given instead.
         The condition is applied after bg substraction if present.
         USE df TO REFER TO data
         e.g.:
@@ -91,67 +551,15 @@ def plot_event(
         as a string with the name of the function. The function 
         needs to belong to matplotlib axes. The default function 
         is ax.plot.
+    cache: bool, default: True
+        reuse the edited data (background, limits and normalization) 
+        computed for the same DataFrame and parameters. See prepare_data
     kwargs:
         keywords to be passed to plt.plot
 
 
     """ 
-    df = data.copy()
-
-
-    #remove bg
-    if(bg_pattern):
-        if(isinstance(bg_pattern,(int,float))):
-            bg = bg_pattern
-        else:
-            bg, labels = background(df,bg_pattern)
-            if(drop_bg == True):
-                df.drop(labels, axis = 1, inplace = True)
-        if(to_background is None):
-            # select all columns apart for x
-            to_background = list(filter(lambda y:y!=x, df.columns))
-        df[to_background] = df[to_background].sub(bg,axis = 0)
-        if add_bg is not None:
-            if isinstance(add_bg, str):
-                df.loc[:,df.columns.str.match(add_bg)] = df.loc[:,df.columns.str.match(add_bg)].add(bg,axis = 0)
-            elif isinstance(add_bg, list):
-                df[add_bg] = df[add_bg].add(bg,axis = 0)
-            else:
-                raise TypeError("Type not allowed for add_bg. Allowed types are str and list.")
-
-    #manage x limits
-    if(xlim):
-        if(not isinstance(xlim,tuple)):
-            raise TypeError("Wrong x limit type. tuple expected.")
-        else:
-            low = xlim[0] if xlim[0] else df["x"].min()
-            high = xlim[1] if xlim[1] else df["x"].max()
-            df = df.query("(x>=@low) and (x<=@high)")
-    #manage y limits
-    if(ylim):
-        if(not isinstance(ylim,str)):
-            raise TypeError("Wrong y limit type. str expected.")
-        else:
-            # df = df.query("y<" + ylim)
-            df.loc[eval(ylim)] = None 
-
-
-    #normalize
-    if(normalized is not None):
-        if (isinstance(normalized, dict)):
-            if (len(normalized)!=2 or "ref" not in normalized or "exclude" not in normalized):
-                raise TypeError("Abnormal normalization dictionary. The dictionary must contain all and only the keywords ref and exclude.")
-            else:
-                ref = normalized.get("ref")
-                exclude = normalized.get("exclude")
-        elif(isinstance(normalized, (str,list))):
-            ref = normalized
-            exclude = x
-        else:
-            raise TypeError("Invalide type for normalization.")
-        df = normalize(df, ref = ref, exclude = exclude)
-    if(shift):
-        df.loc[:,df.columns != x] += shift
+    df = prepare_data(data, x, normalized, bg_pattern, to_background, add_bg, drop_bg, xlim, ylim, cache)
 
 
 
@@ -159,38 +567,19 @@ def plot_event(
     if(not axes):
         axes = plt.axes()
 
-    x = df.pop(x)
-
     f_plot = getattr(axes, plot_function)    
-    if(y_plot is not None):
-        var= deepcopy(y_plot)
-        f_plot(x, df.pop("y"),*var.pop("pos",[]),**var,**kwargs)
-    if(ftot_plot is not None):
-        var= deepcopy(ftot_plot)
-        f_plot(x, df.pop("ftot"),*var.pop("pos",[]),**var,**kwargs)
-    if(other_plot is not None):
-        var = deepcopy(other_plot)
-        if("_rem" not in list(df)):
-            remaining = var.pop("_rem",None)
-        else:
-            print("WARNING! DataFrame contains _rem column")
-            remaining = None
-        for key,value in var.items():
-            sel = df.filter(regex = key)
-            pos = value.pop("pos",[])
-            for _,col in sel.items():
-                f_plot(x, col,*pos,**value,**kwargs)
-            for i in set(sel.columns):
-                df.pop(i)
-        if(remaining is not None):
-            pos = remaining.pop("pos",[])
-            for _,col in df.items():
-                f_plot(x, col,*pos,**remaining,**kwargs)
+    for _, style, columns in _plot_roles(df.columns, x, y_plot, ftot_plot, other_plot):
+        var = deepcopy(style)
+        pos = var.pop("pos",[])
+        for col in columns:
+            #the shift is added here since df can be shared by the cache
+            f_plot(df[x], df[col] + shift if shift else df[col],*pos,**var,**kwargs)
     return axes
 
 
 
 
+@instrument()
 def plot_stack(
         experiment,
         #plot labels
@@ -218,6 +607,8 @@ def plot_stack(
         xlim = None,
         ylim = None,
         plot_function = "plot",
+        fast = True,
+        cache = True,
         **kwargs
         ):
     """
@@ -246,6 +637,10 @@ def plot_stack(
         key to be passed to sorted for custom sorting of the plots
     reverse: bool, default:False
         allows to reverse the order of sort
+    fast: bool, default: True
+        draw all the curves of the same style (y, ftot, each pattern of 
+        other_plot) as one artist. Used only with plot_function = "plot".
+        False calls plot_event for each event
 
     """
     
@@ -270,23 +665,33 @@ def plot_stack(
 
     if (not ax):
         ax = plt.axes()
-    for i,val in enumerate(experiment.values()):
-        plot_event(val.data,
-            x = x,
-            normalized =  normalized,
-            bg_pattern = bg_pattern,
-            to_background = to_background,
-            axes = ax,
-            shift = i*factor + shift,
-            y_plot= y_plot,
-            ftot_plot= ftot_plot,
-            other_plot= other_plot,
-            xlim = xlim,
-            ylim = ylim,
-            **kwargs
-            )
-        if(not isinstance(labels,type(None))):
-            ax.text(xlabels, i*factor + shift + ylabels_shift, labels[i], transform = ax.get_yaxis_transform())
+    shifts = np.arange(len(experiment))*factor + shift
+    if(ylim):
+        # parsed once for all the events
+        ylim = compile_ylim(ylim)
+    if(fast and plot_function == "plot"):
+        frames = [prepare_data(val.data, x, normalized, bg_pattern, to_background, None, drop_bg, xlim, ylim, cache) for val in experiment.values()]
+        _plot_stack_fast(ax, frames, shifts, x, y_plot, ftot_plot, other_plot, kwargs)
+    else:
+        for i,val in enumerate(experiment.values()):
+            plot_event(val.data,
+                x = x,
+                normalized =  normalized,
+                bg_pattern = bg_pattern,
+                to_background = to_background,
+                drop_bg = drop_bg,
+                axes = ax,
+                shift = shifts[i],
+                y_plot= y_plot,
+                ftot_plot= ftot_plot,
+                other_plot= other_plot,
+                xlim = xlim,
+                ylim = ylim,
+                plot_function = plot_function,
+                cache = cache,
+                **kwargs
+                )
+    if(not isinstance(labels,type(None))):
+        for i in range(len(experiment)):
+            ax.text(xlabels, shifts[i] + ylabels_shift, labels[i], transform = ax.get_yaxis_transform())
     return ax
-
-
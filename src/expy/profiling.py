@@ -0,0 +1,171 @@
+import os
+import time
+import inspect
+import threading
+from functools import wraps
+
+# -----------------------------------------------------------------
+# Opt-in instrumentation of the loaders and transforms
+#
+# The functions decorated with instrument record, for each stage, the
+# number of calls, the wall time and, when known, the bytes read and the
+# rows parsed. Nothing is recorded until enable() is called (or inside
+# profile()): disabled, a decorated function only checks one flag.
+# The time of a stage includes the stages it calls. Work done in process
+# pools (workers of load_data and refit) is not recorded.
+# -----------------------------------------------------------------
+
+_enabled = False
+_stats = {}         # stage: [calls, time, bytes, rows]
+_hooks = []
+_lock = threading.Lock()
+
+
+def enable():
+    """Start recording the instrumented stages."""
+    global _enabled
+    _enabled = True
+
+def disable():
+    """Stop recording. The recorded values are kept (see reset)."""
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """Forget the recorded values."""
+    with _lock:
+        _stats.clear()
+
+def add_hook(callback):
+    """
+    Call callback(stage, seconds, nbytes, rows) after each recorded call.
+    nbytes and rows are None when unknown.
+    """
+    _hooks.append(callback)
+
+def remove_hook(callback):
+    _hooks.remove(callback)
+
+def record(stage, seconds, nbytes = None, rows = None):
+    """Add a call of stage to the statistics and call the hooks."""
+    with _lock:
+        values = _stats.setdefault(stage, [0, 0., 0, 0])
+        values[0] += 1
+        values[1] += seconds
+        values[2] += nbytes or 0
+        values[3] += rows or 0
+    for callback in _hooks:
+        callback(stage, seconds, nbytes, rows)
+
+def stats():
+    """
+    Return the recorded values as a DataFrame indexed by stage with
+    columns calls, time (s), mean (s), bytes, rows, sorted by time.
+    """
+    import pandas as pd
+    with _lock:
+        df = pd.DataFrame.from_dict(_stats, orient = "index", columns = ["calls", "time", "bytes", "rows"])
+    df.index.name = "stage"
+    df.insert(2, "mean", df["time"] / df["calls"])
+    return df.sort_values("time", ascending = False)
+
+
+class profile:
+    """
+    Context manager recording the stages run inside it.
+    e.g.:
+        with profiling.profile() as p:
+            ex.load_data(folder)
+        p.stats()
+    """
+    def __init__(self, reset = True):
+        """
+        Input
+        -----------------------------------------------------------------
+        reset: bool, default True
+            forget the values recorded before entering
+        """
+        self.reset = reset
+
+    def __enter__(self):
+        self._previous = _enabled
+        if(self.reset):
+            reset()
+        enable()
+        return self
+
+    def __exit__(self, *args):
+        if(not self._previous):
+            disable()
+
+    def stats(self):
+        return stats()
+
+
+def source_size(source):
+    """Bytes of a file name or of an in-memory file. None if unknown."""
+    if(isinstance(source, (str, os.PathLike))):
+        try:
+            return os.path.getsize(source)
+        except OSError:
+            return None
+    getbuffer = getattr(source, "getbuffer", None)
+    return getbuffer().nbytes if getbuffer is not None else None
+
+def argument_size(position = 0, name = "filename"):
+    """
+    nbytes function for instrument: size of the file (or the list of 
+    files) passed as argument number position or as keyword name.
+    """
+    def nbytes(args, kwargs):
+        source = args[position] if len(args) > position else kwargs.get(name)
+        if(isinstance(source, (list, tuple))):
+            return sum(source_size(s) or 0 for s in source)
+        return source_size(source)
+    return nbytes
+
+def instrument(stage = None, nbytes = None, rows = None):
+    """
+    Decorator recording the calls of a function as stage when the
+    instrumentation is enabled.
+
+    Input
+    -----------------------------------------------------------------
+    stage: str or None, default None
+        name of the stage. None uses the qualified name of the function
+    nbytes: callable or None, default None
+        nbytes(args, kwargs) returns the bytes read by the call
+    rows: callable or None, default None
+        rows(result) returns the rows parsed by the call
+    """
+    def decorator(function):
+        name = stage or function.__qualname__
+
+        def measure(args, kwargs, start, result):
+            record(name, time.perf_counter() - start,
+                nbytes(args, kwargs) if nbytes is not None else None,
+                rows(result) if rows is not None else None)
+
+        if(inspect.iscoroutinefunction(function)):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                if(not _enabled):
+                    return await function(*args, **kwargs)
+                start = time.perf_counter()
+                result = await function(*args, **kwargs)
+                measure(args, kwargs, start, result)
+                return result
+        else:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if(not _enabled):
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                result = function(*args, **kwargs)
+                measure(args, kwargs, start, result)
+                return result
+        return wrapper
+    return decorator
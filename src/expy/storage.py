@@ -0,0 +1,260 @@
+import json
+import os
+import zipfile
+import struct
+import weakref
+import numpy as np
+import pandas as pd
+
+#local imports
+from .event import Event
+from .profiling import instrument
+
+# -----------------------------------------------------------------
+# Binary (npz) storage of an Experiment
+#
+# The data and function tables of all the events are grouped by layout
+# (same columns and dtypes) and each group is stacked in one array:
+#     - "{table}_{k}"          2D block if all the columns share a numeric dtype
+#     - "{table}_{k}_{j}"      one array per numeric column otherwise
+#     - "{table}_{k}_index"    index of the rows if it is not a RangeIndex
+# Non numeric columns, the attributes and the position of each event in
+# the arrays are stored as json in "meta".
+# -----------------------------------------------------------------
+
+FORMAT_VERSION = 1
+
+
+class _TablePacker:
+    """Collect tables of the same kind (data or function) and stack them by layout."""
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.groups = {}
+
+    def add(self, table):
+        """
+        Register a table. Return its position [layout, start, stop] or
+        None if table is not a DataFrame
+        """
+        if(not isinstance(table, pd.DataFrame)):
+            return None
+        layout = (tuple(table.columns), tuple(table.dtypes))
+        group = self.groups.setdefault(layout, {"id":len(self.groups), "tables":[], "rows":0})
+        start = group["rows"]
+        group["tables"].append(table)
+        group["rows"] += len(table)
+        return [group["id"], start, group["rows"]]
+
+    def pack(self, arrays):
+        """Add the stacked arrays to arrays. Return the layouts description."""
+        layouts = []
+        for (columns, dtypes), group in self.groups.items():
+            name = f"{self.prefix}_{group['id']}"
+            tables = group["tables"]
+            numeric = [isinstance(d, np.dtype) and d.kind in "biufc" for d in dtypes]
+            layout = {"columns":list(columns), "dtypes":list(map(str, dtypes)), "block":False, "objects":{}, "index":None}
+
+            if(all(numeric) and len(set(dtypes)) == 1 and columns):
+                arrays[name] = np.concatenate([t.to_numpy() for t in tables])
+                layout["block"] = True
+            else:
+                for j,(c,is_numeric) in enumerate(zip(columns, numeric)):
+                    values = [t.iloc[:,j] for t in tables]
+                    if(is_numeric):
+                        arrays[f"{name}_{j}"] = np.concatenate([v.to_numpy() for v in values])
+                    else:
+                        values = pd.concat(values, ignore_index = True).astype(object)
+                        layout["objects"][str(j)] = values.where(values.notna(), None).tolist()
+
+            if(not all(isinstance(t.index, pd.RangeIndex) and t.index.start == 0 and t.index.step == 1 for t in tables)):
+                index = pd.Index(np.concatenate([t.index.to_numpy() for t in tables]))
+                if(index.dtype.kind in "biuf"):
+                    arrays[f"{name}_index"] = index.to_numpy()
+                    layout["index"] = "array"
+                else:
+                    layout["index"] = index.astype(object).tolist()
+            layouts.append(layout)
+        return layouts
+
+
+@instrument()
+def write_npz(filename, experiment, compress = False):
+    """
+    Save an Experiment in a npz file. See Experiment.save.
+
+    Input
+    -----------------------------------------------------------------
+    filename: str
+        file name. The extension .npz is added if missing
+    experiment: Experiment
+        experiment to save
+    compress: bool, default = False
+        compress the arrays. Uncompressed files are faster to read
+    """
+    data = _TablePacker("data")
+    function = _TablePacker("function")
+    events = []
+    for key, ev in experiment.items():
+        events.append({
+            "key":key,
+            "name":ev.name,
+            "attributes":ev.attributes,
+            "data":data.add(ev.data),
+            "function":function.add(ev.function),
+            })
+    arrays = {}
+    meta = {
+        "format":"expy",
+        "version":FORMAT_VERSION,
+        "name":getattr(experiment, "name", ""),
+        "events":events,
+        "data":data.pack(arrays),
+        "function":function.pack(arrays),
+        }
+    arrays["meta"] = np.array(json.dumps(meta))
+    if(not filename.endswith(".npz")):
+        filename += ".npz"
+    (np.savez_compressed if compress else np.savez)(filename, **arrays)
+
+
+def npz_memmap(filename, key):
+    """
+    Memory map an array stored without compression in a npz file.
+    Return None if the array is compressed.
+    """
+    with zipfile.ZipFile(filename) as z:
+        info = z.getinfo(key + ".npy")
+    if(info.compress_type != zipfile.ZIP_STORED):
+        return None
+    with open(filename, "rb") as f:
+        # local file header: 30 bytes followed by the name and the extra field
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if(version == (1, 0)):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if(dtype.hasobject or 0 in shape):
+        return None
+    return np.memmap(filename, dtype = dtype, mode = "r", offset = offset, shape = shape, order = "F" if fortran_order else "C")
+
+
+class NpzStore:
+    """Read the tables stored by write_npz."""
+    def __init__(self, filename, mmap = False):
+        """
+        Input
+        -----------------------------------------------------------------
+        filename: str
+            npz file
+        mmap: bool, default = False
+            memory map the arrays instead of reading them (only for files
+            saved without compression)
+        """
+        self.filename = filename
+        self.mmap = mmap
+        self.file = np.load(filename, allow_pickle = False)
+        self.meta = json.loads(self.file["meta"][()])
+        if(self.meta.get("format") != "expy"):
+            raise ValueError(f"{filename} is not an Experiment npz file.")
+        self._arrays = {}
+
+    def _array(self, key):
+        # each array is read once from the file
+        if(key not in self._arrays):
+            array = npz_memmap(self.filename, key) if self.mmap else None
+            self._arrays[key] = array if array is not None else self.file[key]
+        return self._arrays[key]
+
+    def table(self, prefix, position):
+        """Return the table stored at position [layout, start, stop] or None."""
+        if(position is None):
+            return None
+        k, start, stop = position
+        layout = self.meta[prefix][k]
+        name = f"{prefix}_{k}"
+        columns = layout["columns"]
+        if(layout["index"] is None):
+            index = pd.RangeIndex(stop - start)
+        elif(layout["index"] == "array"):
+            index = self._array(f"{name}_index")[start:stop]
+        else:
+            index = layout["index"][start:stop]
+
+        if(layout["block"]):
+            return pd.DataFrame(self._array(name)[start:stop], index = index, columns = columns, copy = False)
+        df = {}
+        for j,c in enumerate(columns):
+            if(str(j) in layout["objects"]):
+                df[j] = layout["objects"][str(j)][start:stop]
+            else:
+                df[j] = self._array(f"{name}_{j}")[start:stop]
+        df = pd.DataFrame(df, index = index)
+        df.columns = columns
+        return df
+
+    def events(self, lazy = False):
+        """
+        Iterate over (key, Event). With lazy=True the data of the events 
+        are read from the memory mapped file when accessed (see 
+        NpzDataSource).
+        """
+        for ev in self.meta["events"]:
+            event = Event(
+                name = ev["name"],
+                attributes = ev["attributes"],
+                data = None if lazy else self.table("data", ev["data"]),
+                function = self.table("function", ev["function"]),
+                )
+            if(lazy and ev["data"] is not None):
+                event.set_data_source(NpzDataSource(self.filename, ev["data"]))
+            yield ev["key"], event
+
+    def close(self):
+        self._arrays = {}
+        self.file.close()
+
+
+# stores shared by the NpzDataSource of the same file. The sources hold 
+# their store: it is closed when no event uses it anymore
+_stores = weakref.WeakValueDictionary()
+
+def _open_store(filename):
+    """Memory mapped NpzStore shared by the NpzDataSource of the same file."""
+    key = (os.path.abspath(filename), os.path.getmtime(filename))
+    store = _stores.get(key)
+    if(store is None):
+        store = _stores[key] = NpzStore(filename, mmap = True)
+    return store
+
+
+class NpzDataSource:
+    """Data of an event stored in a npz file. Used by read_npz with lazy=True."""
+    def __init__(self, filename, position):
+        """
+        Input
+        -----------------------------------------------------------------
+        filename: str
+            npz file written by write_npz
+        position: list
+            [layout, start, stop] of the data in the file
+        """
+        self.filename = filename
+        self.position = position
+        self._store = None
+
+    def load(self):
+        """Return a copy of the data table (the memory map is read only)."""
+        if(self._store is None):
+            self._store = _open_store(self.filename)
+        return self._store.table("data", self.position).copy()
+
+    def __getstate__(self):
+        # the open file is not copied
+        state = self.__dict__.copy()
+        state["_store"] = None
+        return state
@@ -1,5 +1,7 @@
 import os 
 
+from .profiling import instrument
+
 def strip_path(path, extension = None):
     """
     remove file path and extension from a filename
@@ -11,6 +13,7 @@ def strip_path(path, extension = None):
     return name
 
 
+@instrument(rows = len)
 def folder_to_files(folder,extension):
     """
     checks if the folder path ends with slash and meke a list of files by extension
@@ -31,4 +34,58 @@ def accept_event_flags(flag, accepted):
     if len(bad)>0:
         bad = ",".join(bad)
         print(f"Warning: Unknown flags [{bad}]. Ignoring those flags.")
-    return flag
\ No newline at end of file
+    return flag
+
+def _call(function, x):
+    """(function(x), None) or (None, exception). Used by parallel_map in the workers."""
+    try:
+        return (function(x), None)
+    except Exception as er:
+        return (None, er)
+
+def parallel_map(function, items, workers = None, executor = "process"):
+    """
+    Apply function to each element of items using a pool of workers. 
+    The results are returned in the same order of items. An exception 
+    raised for one element does not stop the others.
+
+    Input
+    -----------------------------------------------------------------
+    function: callable
+        function taking one element of items. It must be defined at 
+        module level to be used with a process pool
+    items: iterable
+        arguments passed to function
+    workers: int or None, default None
+        number of workers. None or 1 run in the calling thread
+    executor: str, default "process"
+        "process" or "thread". If a process pool can not be used (e.g. 
+        not supported by the platform or function can not be pickled) 
+        a thread pool is used instead
+
+    Return
+    -----------------------------------------------------------------
+    list:
+        list of tuples (result, exception). exception is None when the 
+        call succeeded, result is None otherwise
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    items = list(items)
+    if(workers is None or workers <= 1 or len(items) < 2):
+        return [_call(function, x) for x in items]
+
+    if(executor == "process"):
+        try:
+            with ProcessPoolExecutor(max_workers = workers) as pool:
+                # errors raised by function are returned by _call. Errors 
+                # raised by the futures (pickling, broken pool) are pool failures
+                futures = [pool.submit(_call, function, x) for x in items]
+                return [fut.result() for fut in futures]
+        except Exception as er:
+            print(f"Warning: process pool not available ({er!r}). Using threads.")
+    elif(executor != "thread"):
+        raise ValueError(f"Unknown executor {executor}. Accepted values are 'process' and 'thread'.")
+
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        return list(pool.map(_call, [function]*len(items), items))
@@ -0,0 +1,14 @@
+import os
+import pytest
+from expy import Experiment
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+@pytest.fixture(scope = "module")
+def experiment():
+    """Experiment of the files in tests/data with data and peaks."""
+    ex = Experiment(name = "test")
+    ex.load_data(DATA, extension = ".dat", flag = "pressure")
+    ex.load_peaks(DATA)
+    return ex
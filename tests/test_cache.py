@@ -0,0 +1,55 @@
+import os
+import pandas as pd
+from expy import Experiment
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def test_file_cache(experiment, tmp_path):
+    import shutil
+    from expy.cache import FileCache
+    folder = tmp_path / "data"
+    shutil.copytree(DATA, folder)
+    cache = FileCache(str(tmp_path / "cache"))
+    for i in range(2):
+        ex = Experiment(name = "test")
+        ex.load_data(str(folder), extension = ".dat", flag = "pressure", cache = cache)
+        ex.load_peaks(str(folder), cache = cache)
+        assert sorted(ex) == sorted(experiment)
+        for key,ev in experiment.items():
+            pd.testing.assert_frame_equal(ex[key].data, ev.data)
+            if(ev.function is not None):
+                pd.testing.assert_frame_equal(ex[key].function, ev.function)
+    # modified files are parsed again
+    filename = str(folder / "Spot1_G_P00.dat")
+    assert cache.get(filename, "data", ("fityk", [])) is not None
+    with open(filename, "a") as f:
+        f.write("1 2 3 4\n")
+    assert cache.get(filename, "data", ("fityk", [])) is None
+    cache.invalidate(str(folder / "Spot1_G_P01.dat"))
+    assert cache.get(str(folder / "Spot1_G_P01.dat"), "data", ("fityk", [])) is None
+    cache.max_size = cache.size() // 2
+    cache.put(filename, "data", (None, None, None), ("fityk", []))
+    assert cache.size() <= cache.max_size
+
+
+def test_file_cache_shrink(tmp_path, monkeypatch):
+    from expy.cache import FileCache
+    filenames = []
+    for i in range(200):
+        filenames.append(str(tmp_path / f"{i}.dat"))
+        with open(filenames[-1], "w") as f:
+            f.write("1 2\n")
+    cache = FileCache(str(tmp_path / "cache"), max_size = None)
+    cache.put(filenames[0], "data", "x"*1000)
+    cache.max_size = 40*cache.size()
+    scans = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or entries())
+    for filename in filenames[1:]:
+        cache.put(filename, "data", "x"*1000)
+        assert cache._size == sum(size for _, size, _ in entries()) <= cache.max_size
+    # the oldest entries are removed down to 90% of max_size
+    assert cache.get(filenames[-1], "data") is not None and cache.get(filenames[0], "data") is None
+    # the folder is scanned once every few entries, not at every put once full
+    assert 0 < len(scans) <= len(filenames) // 3
@@ -0,0 +1,31 @@
+import io
+import os
+import pandas as pd
+from expy.event import read_fityk_data, fityk_columns
+from expy.support import folder_to_files
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def read_fityk_data_reference(filename):
+    """read_fityk_data as it was before the numpy parser."""
+    df = pd.read_table(filename, header = None, sep = " ")
+    df.columns = fityk_columns(df.columns.size)
+    return df
+
+
+def test_read_fityk_data(tmp_path):
+    for f in sorted(folder_to_files(DATA, ".dat"))[::10]:
+        df = read_fityk_data(f)
+        # the columns are always float (pandas gives int64 to integer columns)
+        assert (df.dtypes == float).all()
+        pd.testing.assert_frame_equal(df, read_fityk_data_reference(f), check_dtype = False)
+        with open(f, "rb") as content:
+            pd.testing.assert_frame_equal(read_fityk_data(io.BytesIO(content.read())), df)
+    # files numpy can not parse are read by pandas
+    filename = str(tmp_path / "ragged.dat")
+    with open(filename, "w") as f:
+        f.write("1 2 3\n4 5 nan\n7 8 x\n")
+    pd.testing.assert_frame_equal(read_fityk_data(filename), read_fityk_data_reference(filename))
+    with open(filename, "rb") as f:
+        pd.testing.assert_frame_equal(read_fityk_data(f), read_fityk_data_reference(filename))
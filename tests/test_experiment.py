@@ -0,0 +1,202 @@
+import copy
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from expy import Experiment
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def test_tidy_functions_update(experiment):
+    ex = copy.deepcopy(experiment)
+    ex.tidy_functions()
+    ex.functions
+    # modified, removed and added events are patched in the tables
+    ex["Spot1_G_P00"].attributes["P"] = 1.
+    del ex["Spot1_G_P01"]
+    ex["new"] = experiment["Spot1_G_P02"]
+    functions, functions_flat = ex.tidy_functions(inplace = False)
+    pd.testing.assert_frame_equal(ex.functions, functions)
+    pd.testing.assert_frame_equal(ex.functions_flat, functions_flat)
+    # the columns follow the order of the events as in a full build
+    first = next(key for key,ev in ex.items() if ev.function is not None)
+    ex[first] = ex.pop(first)
+    functions, functions_flat = ex.tidy_functions(inplace = False)
+    pd.testing.assert_frame_equal(ex.functions, functions)
+    pd.testing.assert_frame_equal(ex.functions_flat, functions_flat)
+    # an explicit call rebuilds the tables after editing a function table in place
+    ex[first].function.loc[0, "Center"] = -1.
+    ex.tidy_functions()
+    assert ex.functions.loc[ex.functions.name == first, "Center"].iloc[0] == -1.
+
+
+def test_tidy_functions_empty():
+    ex = Experiment(name = "empty")
+    ex.tidy_functions()
+    assert ex.functions.empty and ex.functions_flat.empty
+
+
+def test_data_operations(experiment):
+    normalized = experiment.normalize(ref = "y", exclude = "x")
+    background = experiment.subtract_background("Bg", drop = True)
+    assert list(normalized) == list(background) == list(experiment)
+    for key,ev in experiment.items():
+        df = ev.data.copy()
+        df.loc[:,df.columns != "x"] /= df["y"].max()
+        pd.testing.assert_frame_equal(normalized[key], df)
+        df = ev.data.copy()
+        bg = df.filter(regex = "Bg")
+        df = df.drop(columns = bg.columns)
+        df[["y","ftot"]] = df[["y","ftot"]].sub(bg.sum(axis = 1), axis = 0)
+        pd.testing.assert_frame_equal(background[key], df)
+
+
+@pytest.mark.parametrize("x_grid", [None, np.linspace(1200, 1700, 333)])
+def test_to_matrix(experiment, x_grid):
+    matrix, names, x_grid = experiment.to_matrix("y", x_grid = x_grid)
+    assert names == list(experiment) and matrix.shape == (len(names), x_grid.size)
+    for row, key in zip(matrix, names):
+        df = experiment[key].data.sort_values("x")
+        np.testing.assert_allclose(row, np.interp(x_grid, df.x, df.y, left = np.nan, right = np.nan), atol = 1e-9)
+
+
+def test_to_matrix_nan():
+    from expy import Event
+    x = np.arange(5.)
+    ex = Experiment({name:Event(name = name, data = pd.DataFrame({"x":x, "y":[0, 10, np.nan, 30, 40]})) for name in ["S_P1", "S_P2"]}, name = "test")
+    # the second event is interpolated
+    ex["S_P2"].data["x"] += .25
+    x_grid = np.array([0, .5, 1, 1.5, 2, 3, 3.5, 4])
+    matrix, names, _ = ex.to_matrix("y", x_grid = x_grid)
+    np.testing.assert_array_equal(matrix[0], [0, 5, 10, np.nan, np.nan, 30, 35, 40])
+    matrix, names, _ = ex.to_matrix("y", x_grid = x_grid + .25)
+    np.testing.assert_array_equal(matrix[1], [0, 5, 10, np.nan, np.nan, 30, 35, 40])
+    matrix, names, _ = ex.to_matrix("y", x_grid = x_grid + .25, method = "nearest")
+    np.testing.assert_array_equal(matrix[1], [0, 0, 10, 10, np.nan, 30, 30, 40])
+
+
+def test_get_attributes(experiment):
+    ex = copy.deepcopy(experiment)
+    ex.get_attributes()
+    ex["Spot1_G_P00"].attributes["new"] = "a"
+    del ex["Spot1_G_P01"]
+    attributes = ex.get_attributes()
+    reference = pd.DataFrame([ev.attributes for ev in ex.values()])
+    pd.testing.assert_frame_equal(attributes, reference)
+    # the columns compare and sort as the values
+    pd.testing.assert_series_equal(attributes.Pid < "P05", reference.Pid < "P05")
+    pd.testing.assert_frame_equal(attributes.sort_values(["T1", "Pid"]), reference.sort_values(["T1", "Pid"]))
+    assert list(ex.query("Pid < 'P05'")) == [key for key,ev in ex.items() if isinstance(ev.attributes.get("Pid"), str) and ev.attributes["Pid"] < "P05"]
+    # the returned table is a copy of the kept one
+    attributes.loc[0, "P"] = -1
+    attributes.drop(columns = "T1", inplace = True)
+    pd.testing.assert_frame_equal(ex.get_attributes(), reference)
+
+
+def test_get_attributes_empty(experiment):
+    ex = copy.deepcopy(experiment)
+    ex.get_attributes()
+    # all the events removed and an experiment without events
+    for key in list(ex):
+        del ex[key]
+    for empty in (ex, Experiment(name = "empty")):
+        assert empty.get_attributes().empty
+        assert len(empty.query("P > 1")) == 0
+        assert len(empty.query("P > 1").query("P < 2")) == 0
+        assert len(empty.sort_by("name")) == len(empty.sort_by(["P", "name"]).where([])) == 0
+
+
+def test_query(experiment):
+    center = 1585
+    selected = experiment.query("(T1 == 'Spot1') | (LorentzianA_Center > @center)")
+    reference = Experiment({key:ev for key,ev in experiment.items() if ev.attributes["T1"] == "Spot1" or 
+        (ev.function is not None and (ev.function.query("fname == 'LorentzianA'").Center > center).any())}, name = "test")
+    assert list(selected) == list(reference)
+    assert all(selected[key] is experiment[key] for key in selected)
+    pd.testing.assert_frame_equal(selected.functions, reference.functions)
+    pd.testing.assert_frame_equal(selected.functions_flat, reference.functions_flat)
+    pd.testing.assert_frame_equal(selected.get_attributes(), reference.get_attributes())
+
+
+@pytest.mark.parametrize("by", ["T1", ["T1","Pid"], ("LorentzianA","Center"), "LorentzianA_Center"])
+def test_sort_by(experiment, by):
+    ex = copy.deepcopy(experiment)
+    ex.functions
+    ex.get_attributes()
+    for natural in [True, False]:
+        result = ex.sort_by(by, ascending = False, natural = natural)
+        assert sorted(result) == sorted(ex)
+        reference = Experiment(dict(result), name = "test")
+        pd.testing.assert_frame_equal(result.functions, reference.functions)
+        pd.testing.assert_frame_equal(result.functions_flat, reference.functions_flat)
+        pd.testing.assert_frame_equal(result.get_attributes(), reference.get_attributes())
+    reversed_ex = ex.sort(key = lambda x:x[0], reverse = True)
+    reference = Experiment(dict(reversed_ex), name = "test")
+    pd.testing.assert_frame_equal(reversed_ex.functions, reference.functions)
+    pd.testing.assert_frame_equal(reversed_ex.functions_flat, reference.functions_flat)
+    values = result.functions_flat[("LorentzianA","Center")].dropna() if isinstance(by, tuple) else None
+    if(values is not None):
+        assert values.is_monotonic_decreasing
+
+
+def test_sort_natural():
+    from expy import Event
+    ex = Experiment({name:Event(name = name) for name in ["S_P10", "S_P2", "S_P1"]}, name = "test")
+    assert list(ex.sort_by("name")) == ["S_P1", "S_P2", "S_P10"]
+    assert list(ex.sort_by("name", natural = False)) == ["S_P1", "S_P10", "S_P2"]
+
+
+def test_aload(experiment):
+    import asyncio
+    ex = Experiment(name = "test")
+    asyncio.run(ex.aload_data(DATA, extension = ".dat", flag = "pressure", concurrency = 4))
+    asyncio.run(ex.aload_peaks(DATA, batch_size = 3))
+    assert list(ex) == list(experiment)
+    for key,ev in experiment.items():
+        pd.testing.assert_frame_equal(ex[key].data, ev.data)
+        assert ex[key].attributes == ev.attributes
+    pd.testing.assert_frame_equal(ex.functions, experiment.functions)
+
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_load_data_parallel(executor, tmp_path):
+    ex, reference = Experiment(name = "test"), Experiment(name = "test")
+    ex.load_data(DATA, extension = ".dat", flag = "pressure", workers = 2, executor = executor)
+    reference.load_data(DATA, extension = ".dat", flag = "pressure")
+    assert list(ex) == list(reference)
+    for key,ev in reference.items():
+        pd.testing.assert_frame_equal(ex[key].data, ev.data)
+        assert ex[key].attributes == ev.attributes
+    # files that can not be parsed give events without data in both paths
+    (tmp_path / "good_P1.dat").write_text("1 2 3\n4 5 6\n")
+    (tmp_path / "bad_P2.dat").write_text("1 2\n4 5 6\n")
+    serial, parallel = Experiment(), Experiment()
+    serial.load_data(str(tmp_path), extension = ".dat", header = None, sep = " ")
+    parallel.load_data(str(tmp_path), extension = ".dat", header = None, sep = " ", workers = 2, executor = executor)
+    assert sorted(serial) == sorted(parallel) == ["bad_P2", "good_P1"]
+    assert serial["bad_P2"].data is None and parallel["bad_P2"].data is None
+    assert serial["bad_P2"].attributes == parallel["bad_P2"].attributes
+    pd.testing.assert_frame_equal(serial["good_P1"].data, parallel["good_P1"].data)
+    # errors of the predefined formats are raised in both paths
+    for workers in (None, 2):
+        with pytest.raises(ValueError):
+            Experiment().load_data(str(tmp_path), extension = ".dat", workers = workers, executor = executor)
+        with pytest.raises(OSError):
+            Experiment().load_data([str(tmp_path / "good_P1.dat"), str(tmp_path / "missing.dat")], folder = False, workers = workers, executor = executor)
+
+
+def test_load_pressure(tmp_path):
+    from expy import Event
+    filename = str(tmp_path / "Pressures")
+    pd.DataFrame({"File":["S_P00_a", "P01", "P10", "P11"], "P":[1., 2., 3., 4.], "P_STD":[.1, .2, .3, .4]}).to_csv(filename, sep = "\t", index = False)
+    ex = Experiment({name:Event(name = name, flag = "pressure") for name in ["S_P00_a", "A_P01", "A_P1", "A_P99", "B_P10"]}, name = "test")
+    ex["B_P10"].attributes["P"] = -1.
+    issues = ex.load_pressure(filename, col_errors = 2)
+    assert (ex["S_P00_a"].attributes["P"], ex["S_P00_a"].attributes["errP"]) == (1., .1)
+    assert (ex["A_P01"].attributes["P"], ex["A_P01"].attributes["errP"]) == (2., .2)
+    assert ex["B_P10"].attributes["P"] == -1.
+    assert issues.to_dict("list") == {"event":["A_P1", "A_P99"], "Pid":["P1", "P99"], 
+        "issue":["multiple matches", "no match"], "matches":[["P10", "P11"], []]}
+    issues = ex.load_pressure(filename, force_reload = True)
+    assert ex["B_P10"].attributes["P"] == 3. and len(issues) == 2
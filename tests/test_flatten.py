@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+import pytest
+from expy.event import flatten_function, flatten_functions, function_tables
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def flatten_function_reference(data):
+    """flatten_function as it was before the vectorized version."""
+    df = data.copy()
+    names = df.pop("fname")
+    names = names + "_" + pd.DataFrame(names).groupby("fname").cumcount().astype(str).replace("0","")
+    names = names.str.removesuffix("_")
+    df.drop(columns = ["fid","Lineshape"], errors = "ignore", inplace = True)
+    indexes = pd.MultiIndex.from_product([names, df.columns])
+    s = pd.concat([i[1] for i in df.iterrows()])
+    s.index = indexes
+    s.dropna(inplace = True)
+    return s
+
+
+def test_flatten_function(experiment):
+    for ev in experiment.values():
+        if ev.function is None:
+            continue
+        pd.testing.assert_series_equal(flatten_function(ev.function), flatten_function_reference(ev.function), check_names = False)
+
+
+@pytest.mark.parametrize("extra", ["all", "minimal", ["T1","T3"], None])
+def test_flatten_functions(experiment, extra):
+    events = [ev for ev in experiment.values() if ev.function is not None]
+    reference = pd.DataFrame([ev.get_function_flat(extra) for ev in events])
+    pd.testing.assert_frame_equal(flatten_functions(events, extra), reference)
+
+
+def test_flatten_functions_missing(experiment):
+    # events without functions only add the extra values
+    events = list(experiment.values())
+    reference = pd.DataFrame([ev.get_function_flat() for ev in events])
+    pd.testing.assert_frame_equal(flatten_functions(events), reference)
+
+
+@pytest.mark.parametrize("extra", ["all", "minimal", ["T1","T3"], None])
+def test_function_tables(experiment, extra):
+    reference = pd.concat([ev.get_function_table(extra) for ev in experiment.values()]).reset_index(drop = True)
+    pd.testing.assert_frame_equal(function_tables(experiment.values(), extra), reference)
+
+
+@pytest.mark.parametrize("errors", [True, False])
+def test_read_peaks(errors):
+    from expy.event import read_peaks
+    from expy.support import folder_to_files
+    files = folder_to_files(DATA, ".peaks")
+    for f, function in zip(files, read_peaks(files, errors)):
+        pd.testing.assert_frame_equal(function, read_peaks([f], errors)[0])
+        assert ("err_a0" in function.columns) == errors
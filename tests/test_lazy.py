@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+from expy import Experiment
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def test_lazy_data(experiment, tmp_path):
+    from expy import read
+    from expy.lazy import set_cache_size
+    lazy = Experiment(name = "test")
+    lazy.load_data(DATA, extension = ".dat", flag = "pressure", lazy = True)
+    lazy.load_peaks(DATA)
+    filename = str(tmp_path / "test.npz")
+    experiment.save(filename, format = "npz")
+    for ex in [lazy, read(filename, lazy = True)]:
+        set_cache_size(2)
+        for key,ev in experiment.items():
+            assert ex[key].is_lazy
+            pd.testing.assert_frame_equal(ex[key].data, ev.data, check_index_type = False)
+        set_cache_size(256)
+
+
+def test_npz_store_released(experiment, tmp_path):
+    import gc
+    import copy
+    from expy import read
+    from expy.storage import _stores
+    filename = str(tmp_path / "test.npz")
+    experiment.save(filename, format = "npz")
+    ex = read(filename, lazy = True)
+    key = next(iter(ex))
+    pd.testing.assert_frame_equal(copy.deepcopy(ex)[key].data, experiment[key].data, check_index_type = False)
+    assert any(path == os.path.abspath(filename) for path,_ in _stores.keys())
+    # the file is closed when no event uses it
+    del ex
+    gc.collect()
+    assert not any(path == os.path.abspath(filename) for path,_ in _stores.keys())
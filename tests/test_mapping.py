@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from expy import Experiment
+
+
+def test_map_index():
+    from expy import Event
+    ex = Experiment(name = "map")
+    for i in range(4):
+        for j in range(3):
+            ev = Event(name = f"{i},5:{j}")
+            ev.parse_pos_from_name()
+            ev.function = pd.DataFrame({"fid":["%_1"], "fname":["G"], "Center":[10.*i + j]})
+            ex[ev.name] = ev
+    index = ex.map_index()
+    assert index.nearest((1.4, 0.9)) == "1,5:1"
+    assert index.roi((1, 3), (1, None)) == ["1,5:1", "1,5:2", "2,5:1", "2,5:2"]
+    assert index.within((0.5, 0), 1) == ["0,5:0", "0,5:1", "1,5:0"]
+    assert index.within((10, 10), 1) == []
+    assert index.within([(0.5, 0), (10, 10), (3.5, 2)], 1) == [["0,5:0", "0,5:1", "1,5:0"], [], ["2,5:2", "3,5:1", "3,5:2"]]
+    # more neighbours than events
+    keys, dist = index.nearest((0.5, 0), k = 20, distance = True)
+    assert sorted(keys) == sorted(ex) and np.all(np.diff(dist) >= 0) and np.isfinite(dist).all()
+    keys = index.nearest([(0.5, 0), (3.5, 2)], k = 20)
+    assert keys.shape == (2, len(ex)) and keys[0,0] == "0,5:0" and keys[1,0] == "3,5:2"
+    image, x, y = ex.rasterize(("G", "Center"))
+    np.testing.assert_array_equal(x, [.5, 1.5, 2.5, 3.5])
+    np.testing.assert_array_equal(image, 10.*np.arange(4) + np.arange(3)[:,None])
+    ex["0,5:0"].attributes["map_x"] = -1.
+    assert ex.map_index().nearest((-1, 0)) == "0,5:0"
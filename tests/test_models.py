@@ -0,0 +1,76 @@
+import copy
+import numpy as np
+import pandas as pd
+from expy import Experiment
+
+
+def test_evaluate_functions(experiment):
+    lineshapes = {name:"LorentzianA" for name in ["Air", "Bg1", "Sapphire"] + [f"RBM{i}" for i in "1235678"] + ["RBM1B", "RBM2B"]}
+    lineshapes["Bg2"] = "Polynomial6"
+    curves = experiment.evaluate_functions(lineshapes = lineshapes, chunk_size = 5)
+    assert list(curves) == [key for key,ev in experiment.items() if ev.function is not None]
+    for key,df in curves.items():
+        data = experiment[key].data[df.columns]
+        # the data files are written with 6 significant digits
+        np.testing.assert_allclose(df, data, rtol = 1e-3, atol = 1e-3 * data.abs().max().max())
+
+
+def test_refit():
+    from expy import Event
+    from expy.models import evaluate
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 100, 500)
+    ex = Experiment(name = "fit")
+    for i in range(6):
+        true = pd.DataFrame({"fid":["%_1", "%_2", "%_3"], "fname":["LorentzianA", "GaussianA", "Linear"],
+            "Center":np.nan, "Height":np.nan, "Area":np.nan, "FWHM":np.nan,
+            "a0":[1000., 500., 2.], "err_a0":1., "a1":[40. + i, 60. - i, 0.01], "err_a1":1., "a2":[3., 4., np.nan], "err_a2":[1., 1., np.nan]})
+        ev = Event(name = f"S_P{i}", data = pd.DataFrame({"x":x, "y":evaluate(true, x)["ftot"] + rng.normal(0, 0.1, x.size)}))
+        ev.attributes["P"] = float(i)
+        guess = true.copy()
+        guess[["a0", "a1", "a2"]] *= 1.05
+        ev.function = guess
+        ev.true = true
+        ex[ev.name] = ev
+    functions, report = ex.refit(order = "P", inplace = False, workers = 2, executor = "thread")
+    assert report.success.all() and list(report.index) == list(ex)
+    for key, ev in ex.items():
+        table = functions[key]
+        np.testing.assert_allclose(table[["a0", "a1"]], ev.true[["a0", "a1"]], rtol = 1e-2, atol = 1e-3)
+        assert (table[["err_a0", "err_a1"]] > 0).all().all()
+        np.testing.assert_allclose(table.loc[0, ["Center", "Area", "FWHM"]].astype(float), [table.a1[0], table.a0[0], 2 * table.a2[0]])
+        assert table.loc[2, ["Center", "Height"]].isna().all()
+    ex.refit(warm_start = False)
+    pd.testing.assert_frame_equal(ex["S_P3"].function, functions["S_P3"], rtol = 1e-4)
+
+
+def test_refit_fixed(experiment):
+    # Bg2 of RBM_P02:1:4 (%_150) has the parameters a4, a5, a6 fixed in fityk ("0 +/- ?")
+    key = "RBM_P02:1:4"
+    lineshapes = {name:"LorentzianA" for name in ["Air", "Bg1", "Sapphire"] + [f"RBM{i}" for i in "1235678"] + ["RBM1B", "RBM2B"]}
+    lineshapes["Bg2"] = "Polynomial6"
+    function = experiment[key].function
+    assert function.attrs["fixed"] == {"%_150":(4, 5, 6)}
+    # the errors are read as 0 as before
+    bg = function.index[function.fid == "%_150"][0]
+    assert (function.loc[bg, ["err_a4", "err_a5", "err_a6"]] == 0).all()
+    parameters = [f"a{j}" for j in range(7)]
+    errors = ["err_" + p for p in parameters]
+    fixed = np.zeros((len(function), 7), dtype = bool)
+    fixed[function.index.get_loc(bg), 4:] = True
+    free = function[parameters].notna().to_numpy() & ~fixed
+
+    selected = experiment.where([k == key for k in experiment])
+    for fixed_parameters in (None, {"%_150":[4, 5, 6]}):
+        functions, report = selected.refit(lineshapes = lineshapes, inplace = False, fixed = fixed_parameters, max_nfev = 10)
+        table = functions[key]
+        # fixed parameters keep their values and errors, the others are fitted
+        np.testing.assert_array_equal(table[parameters].to_numpy()[fixed], function[parameters].to_numpy()[fixed])
+        np.testing.assert_array_equal(table[errors].to_numpy()[fixed], function[errors].to_numpy()[fixed])
+        assert np.isfinite(table[errors].to_numpy(dtype = float)[free]).all()
+        assert not np.array_equal(table[parameters].to_numpy()[free], function[parameters].to_numpy()[free])
+    # without the fixed parameters all are fitted
+    selected = copy.deepcopy(selected)
+    selected[key].function.attrs.clear()
+    functions, report = selected.refit(lineshapes = lineshapes, inplace = False, max_nfev = 10)
+    assert np.isfinite(functions[key][errors].to_numpy(dtype = float)[free | fixed]).all()
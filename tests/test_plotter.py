@@ -0,0 +1,127 @@
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.colors import to_rgba
+from expy import Experiment
+from expy.plotter import plot_stack, prepare_data, prepare_cache, compile_ylim, _parse_format
+
+
+@pytest.fixture(scope = "module")
+def stack(experiment):
+    """A few events with functions for the stack plots."""
+    keys = [key for key,ev in experiment.items() if ev.function is not None][:5]
+    return Experiment({key:experiment[key] for key in keys}, name = "test")
+
+
+def split_nan(xy):
+    """Parts of a curve separated by nan."""
+    xy = np.reshape(xy, (-1, 2))
+    missing = np.isnan(xy).any(axis = 1)
+    parts = np.split(np.where(missing[:,None], np.nan, xy), np.flatnonzero(missing))
+    parts = [part[~np.isnan(part[:,1])] for part in parts]
+    return [tuple(map(tuple, part.round(8))) for part in parts if len(part)]
+
+
+def drawn_curves(ax):
+    """Curves drawn on ax as sorted (color, marker, points) ignoring the artists used."""
+    curves = []
+    for line in ax.lines:
+        color = to_rgba(line.get_color(), line.get_alpha())
+        curves += [(color, line.get_marker(), part) for part in split_nan(line.get_xydata())]
+    for collection in ax.collections:
+        colors = collection.get_colors()
+        # get_segments drops the nan breaking the curves
+        for i, path in enumerate(collection.get_paths()):
+            color = tuple(colors[i % len(colors)])
+            curves += [(color, "None", part) for part in split_nan(path.vertices)]
+    return sorted(curves)
+
+
+@pytest.mark.parametrize("ylim", [None, "df.y > df.y.quantile(.9)"])
+@pytest.mark.parametrize("other_plot", [
+    {"_rem":{"pos":["-b"],"alpha":.3}},
+    # colors from the color cycle
+    {"_rem":{"pos":["-"]}},
+    ])
+def test_plot_stack_fast(stack, other_plot, ylim):
+    curves, artists = [], []
+    for fast in (False, True):
+        fig, ax = plt.subplots()
+        plot_stack(stack, ax = ax, factor = 100, other_plot = other_plot, fast = fast, ylim = ylim)
+        curves.append(drawn_curves(ax))
+        artists.append(len(ax.lines) + len(ax.collections))
+        plt.close(fig)
+    assert len(curves[0]) > 0
+    assert curves[0] == curves[1]
+    # one artist for y, ftot and the other columns
+    assert artists[1] == 3 < artists[0]
+
+
+def test_prepare_data_cache(stack):
+    data = next(iter(stack.values())).data.copy()
+    params = dict(bg_pattern = "Lorentzian", ylim = "df.y > df.y.quantile(.9)")
+    df = prepare_data(data, **params)
+    assert prepare_data(data, **params) is df
+    pd.testing.assert_frame_equal(df, prepare_data(data, **params, cache = False))
+    # edits in place compute the table again
+    data["y"] *= 10
+    edited = prepare_data(data, **params)
+    assert edited is not df
+    pd.testing.assert_frame_equal(edited, prepare_data(data, **params, cache = False))
+    data.loc[1, "y"] = -7
+    pd.testing.assert_frame_equal(prepare_data(data, **params), prepare_data(data, **params, cache = False))
+    prepare_cache.clear()
+    assert len(prepare_cache) == 0
+
+
+def test_compile_ylim(stack):
+    df = next(iter(stack.values())).data
+    valid = [
+        "df.y > df.loc[(df.x > 1000) & (df.x < 2000)].y.max()",
+        "df.y.gt(2*df.y.median()) | df.ftot.le(0)",
+        "df.y.between(0, df.y.quantile(.5)) & df.y.ne(df.y.max())",
+        "abs(df.y - df.ftot) > max(df.y) / len(df)",
+        "np.log(abs(df.y) + 1) > round(np.log(df.y.max()), 2)",
+        ]
+    for ylim in valid:
+        pd.testing.assert_series_equal(compile_ylim(ylim)(df), eval(ylim, {"np":np}, {"df":df}))
+    unsafe = [
+        "__import__('os').system('ls')",
+        "df.__class__.__bases__",
+        "df._mgr",
+        "os.getcwd()",
+        "open('file')",
+        "(lambda: 1)()",
+        "[c for c in df]",
+        "np.load('file')",
+        "df.to_csv('file')",
+        "df.y.pipe(print)",
+        ]
+    for ylim in unsafe:
+        with pytest.raises(ValueError):
+            compile_ylim(ylim)
+
+
+def test_parse_format():
+    formats = {
+        "-r":("-", "None", "r"),
+        ".k":("None", ".", "k"),
+        "--C1":("--", "None", "C1"),
+        "s--g":("--", "s", "g"),
+        "-.b":("-.", "None", "b"),
+        ".-":("-", ".", None),
+        "o":("None", "o", None),
+        ":":(":", "None", None),
+        # color only and markers that look like colors
+        "r":(None, None, "r"),
+        "C12":(None, None, "C12"),
+        "0.5":(None, None, "0.5"),
+        "1":("None", "1", None),
+        }
+    for fmt, style in formats.items():
+        assert _parse_format(fmt) == style
+    with pytest.raises(ValueError):
+        _parse_format("-z")
@@ -0,0 +1,29 @@
+import os
+from expy import Experiment
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def test_profiling():
+    from expy import profiling
+    calls = []
+    hook = lambda stage, seconds, nbytes, rows: calls.append(stage)
+    profiling.add_hook(hook)
+    try:
+        with profiling.profile() as p:
+            ex = Experiment(name = "test")
+            ex.load_data(DATA, extension = ".dat", flag = "pressure")
+            ex.load_peaks(DATA)
+        stats = p.stats()
+        assert not profiling.is_enabled()
+        assert {"Experiment.load_data", "read_data", "read_peaks", "folder_to_files"} <= set(stats.index)
+        assert stats.loc["read_data", "calls"] == len(ex)
+        assert stats.loc["read_data", "bytes"] == sum(os.path.getsize(os.path.join(DATA, f)) for f in os.listdir(DATA) if f.endswith(".dat"))
+        assert stats.loc["read_data", "rows"] == sum(len(ev.data) for ev in ex.values())
+        assert stats.loc["read_peaks", "rows"] == sum(len(ev.function) for ev in ex.values() if ev.function is not None)
+        assert len(calls) == stats["calls"].sum()
+        #nothing recorded when disabled
+        ex.get_attributes()
+        assert "Experiment.get_attributes" not in profiling.stats().index
+    finally:
+        profiling.remove_hook(hook)
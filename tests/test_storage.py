@@ -0,0 +1,59 @@
+import json
+import pandas as pd
+import pytest
+from expy import Experiment, read
+from expy.io import iter_events
+
+
+@pytest.fixture(scope = "module")
+def small(experiment):
+    """A few events of the experiment, with and without functions."""
+    keys = [key for key,ev in experiment.items() if ev.function is not None][:4]
+    keys += [key for key,ev in experiment.items() if ev.function is None][:1]
+    return Experiment({key:experiment[key] for key in keys}, name = "test")
+
+
+def assert_events_equal(ex, reference):
+    assert list(ex) == list(reference)
+    for key,ev in reference.items():
+        assert ex[key].name == ev.name and ex[key].attributes == ev.attributes
+        pd.testing.assert_frame_equal(ex[key].data, ev.data, check_index_type = False)
+        if(ev.function is None):
+            assert ex[key].function is None
+        else:
+            pd.testing.assert_frame_equal(ex[key].function, ev.function, check_index_type = False)
+
+
+@pytest.mark.parametrize("indent", ["\t", 2, None])
+def test_save_json(small, indent, tmp_path):
+    filename = str(tmp_path / "test.json")
+    small.save(filename, indent = indent)
+    with open(filename) as f:
+        assert f.read() == json.dumps({key:ev.to_dict() for key,ev in small.items()}, indent = indent)
+    Experiment(name = "empty").save(filename, indent = indent)
+    with open(filename) as f:
+        assert f.read() == json.dumps({}, indent = indent)
+
+
+@pytest.mark.parametrize("chunk_size", [64, 1 << 20])
+def test_iter_events(small, chunk_size, tmp_path):
+    filename = str(tmp_path / "test.json")
+    small.save(filename)
+    events = dict(iter_events(filename, chunk_size = chunk_size))
+    assert_events_equal(Experiment(events, name = "test"), small)
+    # lazy events read their data from the position of the event in the file
+    lazy = dict(iter_events(filename, lazy = True, chunk_size = chunk_size))
+    assert all(ev.is_lazy for ev in lazy.values())
+    assert_events_equal(Experiment(lazy, name = "test"), small)
+    assert_events_equal(read(filename, lazy = True), small)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_npz(experiment, compress, tmp_path):
+    experiment.save(str(tmp_path / "test.json"))
+    experiment.save(str(tmp_path / "test.npz"), format = "npz", compress = compress)
+    npz, reference = read(str(tmp_path / "test.npz")), read(str(tmp_path / "test.json"))
+    assert npz.name == experiment.name
+    assert_events_equal(npz, reference)
+    pd.testing.assert_frame_equal(npz.functions, reference.functions)
+    pd.testing.assert_frame_equal(npz.functions_flat, reference.functions_flat)
@@ -0,0 +1,26 @@
+import os
+from expy import Experiment
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def test_tokenizer(experiment):
+    import pickle
+    from expy import Tokenizer
+    from expy.event import tokenize
+    tokenizer = Tokenizer(schema = {"T1":"sample", "T2":"laser", "T3":("spot", int)})
+    assert tokenizer("Spot1_G_P00", pid = True) == {"Pid":"P00", "sample":"Spot1", "laser":"G"}
+    tokens = tokenizer("RBM_G_3")
+    tokens["spot"] = 4
+    assert tokenizer("RBM_G_3") == {"sample":"RBM", "laser":"G", "spot":3}
+    assert tokenize("a-P1-b", "-", True) == {"T1":"a", "T3":"b", "Pid":"P1"}
+    assert pickle.loads(pickle.dumps(tokenizer))("a_b_x") == {"sample":"a", "laser":"b", "spot":"x"}
+    ex = Experiment(name = "test", tokenizer = tokenizer)
+    ex.load_data(DATA, extension = ".dat", flag = "pressure")
+    assert sorted(ex) == sorted(experiment)
+    attributes = ex.get_attributes()
+    assert {"sample", "laser", "Pid"} <= set(attributes.columns) and "T1" not in attributes.columns
+    assert list(attributes["sample"]) == [ev.attributes["T1"] for ev in experiment.values()]
+    # experiments derived from ex keep its tokenizer
+    for derived in (ex.sort(), ex.sort_by("Pid"), ex.where([True]*len(ex)), ex.query("laser == 'G'")):
+        assert derived.tokenizer is tokenizer